@@ -0,0 +1,104 @@
+import argparse, json, time, os, tempfile
+from utilities.synthetic import generate_events, write_tree
+from predict import *
+from hypotheses import best_candidates, best_candidates_planned
+
+# (name, options of generate_event()) of the benchmarked event sizes
+SIZES = [('small', {'jets': (1, 2), 'multiplicity': 10, 'underlying': 10}),
+         ('medium', {'jets': (2, 4), 'multiplicity': 20, 'underlying': 30}),
+         ('large', {'jets': (4, 6), 'multiplicity': 40, 'underlying': 80})]
+
+def timed(function, repeat):
+	"""
+	Return: Best wall-clock time of repeat calls, in seconds
+	Input: function | Function without arguments
+	       repeat   | Number of calls
+	"""
+	best = float('inf')
+	for _ in range(repeat):
+		t0 = time.time()
+		function()
+		best = min(best, time.time() - t0)
+	return best
+
+def benchmark_size(events, repeat = 3, root = False):
+	"""
+	Return: Dictionary of benchmark -> seconds
+	Input: events | List of events
+	       repeat | Repetitions per benchmark (the best is kept)
+	       root   | Also time predict() reading a ROOT file
+	"""
+	groups = [group_particles(event) for event in events]
+	jets = [(event, jet_num, group) for event, group in zip(events, groups)
+	        for jet_num in range(len(event.genjetid)) if not remove_leptons(event, jet_num, group)]
+	pools = [gen_candidates(event, jet_num, 0.5, 0.5, group) for event, jet_num, group in jets]
+	ep = [[vec for _, vec in pool.ep] for pool in pools]
+	iso = [(isolation_particles(event), [max_[1]]) for (event, _, _), max_ in zip(jets, best_candidates(pools)) if max_]
+
+	results = {}
+	results['group_particles'] = timed(lambda: [group_particles(event) for event in events], repeat)
+	results['gen_candidates'] = timed(lambda: [gen_candidates(event, jet_num, 0.5, 0.5, group) for event, jet_num, group in jets], repeat)
+	results['gen_strips'] = timed(lambda: [gen_strips(vecs) for vecs in ep], repeat)
+	results['hypothesis1'] = timed(lambda: [hypothesis1(pool) for pool in pools], repeat)
+	results['hypothesis2'] = timed(lambda: [hypothesis2(pool) for pool in pools], repeat)
+	results['hypothesis3'] = timed(lambda: [hypothesis3(pool) for pool in pools], repeat)
+	results['hypothesis4'] = timed(lambda: [hypothesis4(pool) for pool in pools], repeat)
+	results['hypotheses (batch)'] = timed(lambda: best_candidates(pools), repeat)
+	results['hypotheses (planner)'] = timed(lambda: best_candidates_planned(pools), repeat)
+	results['isolation_particles'] = timed(lambda: [isolation_particles(event) for event in events], repeat)
+	results['isolation'] = timed(lambda: [isolation_batch(grid, pairs, float('inf')) for grid, pairs in iso], repeat)
+	results['predict (in memory)'] = timed(lambda: run_events(events, len(events), 0.5, 0.5, float('inf'), progress = False), repeat)
+
+	if root:
+		fd, filename = tempfile.mkstemp(suffix = '.root')
+		os.close(fd)
+		try:
+			write_tree(filename, events)
+			results['predict (ROOT file)'] = timed(lambda: run_events(read_events(filename, 'GenNtupler/gentree', len(events)),
+			                                                          len(events), 0.5, 0.5, float('inf'), progress = False), repeat)
+		finally:
+			os.remove(filename)
+
+	return results
+
+def compare(before, after):
+	"""
+	Return: None
+	Input: before | Results loaded from an earlier run
+	       after  | Results of this run
+	"""
+	print '%-8s %-24s %12s %12s %10s' % ('Size', 'Benchmark', 'before', 'after', 'ratio')
+	for size in sorted(after['results']):
+		for name in sorted(after['results'][size]):
+			b = after['results'][size][name]
+			a = before['results'].get(size, {}).get(name)
+			if a is None: print '%-8s %-24s %12s %12.4f %10s' % (size, name, '-', b, '-')
+			else: print '%-8s %-24s %12.4f %12.4f %10.3f' % (size, name, a, b, b/a)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-n', '--number', dest='number', type=int, default=1000, help='number of events per size')
+	parser.add_argument('-r', '--repeat', dest='repeat', type=int, default=3, help='repetitions per benchmark')
+	parser.add_argument('-s', '--seed', dest='seed', type=int, default=0, help='random seed')
+	parser.add_argument('-o', '--output', dest='output', default=None, help='results file (default: not saved)')
+	parser.add_argument('-c', '--compare', dest='compare', default=None, help='earlier results file to compare against')
+	parser.add_argument('-l', '--label', dest='label', default='', help='name of this run')
+	parser.add_argument('--root', dest='root', action='store_true', help='also time predict() on a ROOT file')
+	options = parser.parse_args()
+
+	output = {'label': options.label, 'number': options.number, 'seed': options.seed, 'results': {}}
+	for name, kwargs in SIZES:
+		events = generate_events(options.number, options.seed, **kwargs)
+		output['results'][name] = benchmark_size(events, options.repeat, options.root)
+
+		print name
+		for bench in sorted(output['results'][name]):
+			print '\t%-24s %10.4f s' % (bench, output['results'][name][bench])
+
+	if options.output:
+		with open(options.output, 'w') as f:
+			json.dump(output, f, indent = 1, sort_keys = True)
+
+	if options.compare:
+		with open(options.compare) as f:
+			compare(json.load(f), output)
@@ -0,0 +1,141 @@
+import os, hashlib, tempfile
+import numpy as np
+from fourvector import FourVector
+from predict import Predictions, run_predict, working_points, ALGORITHM_VERSION
+from sources import EventSource
+
+CACHE_DIR = os.environ.get('HPS_CACHE_DIR', os.path.expanduser('~/.cache/hps-algorithm'))
+CACHE_SIZE = 2*1024**3 # bytes kept on disk before evicting least recently used results
+
+def cache_key(filename, treeNum, iterations, hadron_cut, ep_cut, iso_cutoff, max_seeds = 6):
+	"""
+	Return: Hex digest identifying a predict() result
+	Input: same as predict()
+	"""
+	if os.path.isdir(filename): stat = os.stat(os.path.join(filename, 'meta.json')) # event store
+	else: stat = os.stat(filename)
+	# full-resolution mtime, so a rewrite within the same second is not a hit
+	fields = (os.path.abspath(filename), stat.st_size, repr(stat.st_mtime), treeNum, int(iterations),
+	          repr(float(hadron_cut)), repr(float(ep_cut)), repr(float(iso_cutoff)), ALGORITHM_VERSION, int(max_seeds))
+	return hashlib.sha1(repr(fields).encode('utf-8')).hexdigest()
+
+def _vectors(vecs):
+	return np.array([(v.pt, v.eta, v.phi, v.e) for v in vecs], dtype = np.float64).reshape(len(vecs), 4)
+
+def save(predictions, path):
+	"""
+	Return: None
+	Input: predictions | Predictions
+	       path        | Output .npz file
+	"""
+	arrays = {
+		'tau_id': np.array([t[0] for t in predictions.tau], dtype = np.int32),
+		'tau_guess': np.array([int(t[1]) for t in predictions.tau], dtype = np.int8),
+		'tau_p4': _vectors([t[2] for t in predictions.tau]),
+		'other_id': np.array([o[0] for o in predictions.other], dtype = np.int32),
+		'other_p4': _vectors([o[1] for o in predictions.other]),
+		'iso_id': np.array([i[0] for i in predictions.isolation], dtype = np.int32),
+		'iso': np.array([i[1] for i in predictions.isolation], dtype = np.float64),
+		'accuracy': np.array(predictions.accuracy, dtype = np.float64),
+		'events': np.array(predictions.events, dtype = np.int64),
+		'rejected': np.array(predictions.rejected, dtype = np.int64),
+		'planner': np.array([predictions.planner.tried, predictions.planner.pruned, predictions.planner.skipped], dtype = np.int64),
+	}
+
+	# write to a temporary file first so readers never see a partial result;
+	# evict() skips the .tmp suffix, so a concurrent eviction cannot remove it
+	fd, tmp = tempfile.mkstemp(suffix = '.npz.tmp', dir = os.path.dirname(path))
+	with os.fdopen(fd, 'wb') as f:
+		np.savez_compressed(f, **arrays)
+	os.rename(tmp, path)
+
+def load(path):
+	"""
+	Return: Predictions
+	Input: path | .npz file written by save()
+	"""
+	data = np.load(path)
+	predictions = Predictions()
+
+	vec = lambda p: FourVector(*[float(x) for x in p])
+	predictions.tau = [(int(i), str(g), vec(p)) for i, g, p in zip(data['tau_id'], data['tau_guess'], data['tau_p4'])]
+	predictions.other = [(int(i), vec(p)) for i, p in zip(data['other_id'], data['other_p4'])]
+	predictions.isolation = [(int(i), float(v)) for i, v in zip(data['iso_id'], data['iso'])]
+	predictions.accuracy = [float(a) for a in data['accuracy']]
+	predictions.events = int(data['events'])
+	predictions.rejected = int(data['rejected'])
+	predictions.planner.tried, predictions.planner.pruned, predictions.planner.skipped = [int(x) for x in data['planner']]
+	data.close()
+
+	return predictions
+
+def evict(cache_dir = CACHE_DIR, max_size = CACHE_SIZE, keep = None):
+	"""
+	Return: None
+	Input: cache_dir | Cache directory
+	       max_size  | Size cap in bytes
+	       keep      | Path never evicted (the result just written)
+	"""
+	entries = []
+	for name in os.listdir(cache_dir):
+		if not name.endswith('.npz'): continue
+		path = os.path.join(cache_dir, name)
+		try: stat = os.stat(path)
+		except OSError: continue # removed by another process
+		entries.append((stat.st_mtime, stat.st_size, path)) # mtime is refreshed on every hit
+
+	total = sum(size for _, size, _ in entries)
+	for _, size, path in sorted(entries):
+		if total <= max_size: break
+		if path == keep: continue
+		try: os.remove(path)
+		except OSError: pass # already removed by another process
+		total -= size
+
+def cached_run_predict(filename, treeNum, iterations, hadron_cut = 0, ep_cut = 0, iso_cutoff = float('inf'),
+                       cache_dir = CACHE_DIR, max_size = CACHE_SIZE, **kwargs):
+	"""
+	Return: Predictions (list of Predictions for a list of cutoffs), from the cache when available
+	Input: same as predict()
+	       cache_dir | Cache directory
+	       max_size  | Size cap in bytes
+	       kwargs    | Further predict() options (engine, chunk_size, selection, max_seeds)
+	"""
+	if isinstance(filename, EventSource): # no file to key the cache on
+		return run_predict(filename, treeNum, iterations, hadron_cut, ep_cut, iso_cutoff, **kwargs)
+
+	if not os.path.isdir(cache_dir): os.makedirs(cache_dir)
+
+	# one cache entry per working point
+	cutoffs = working_points(iso_cutoff)
+	max_seeds = kwargs.get('max_seeds', 6)
+	paths = [os.path.join(cache_dir, cache_key(filename, treeNum, iterations, hadron_cut, ep_cut, cutoff, max_seeds) + '.npz')
+	         for cutoff in cutoffs]
+	results = [None]*len(cutoffs)
+
+	for i, path in enumerate(paths):
+		if os.path.exists(path):
+			os.utime(path, None) # mark as recently used
+			results[i] = load(path)
+
+	missing = [i for i, r in enumerate(results) if r is None]
+	if missing:
+		computed = run_predict(filename, treeNum, iterations, hadron_cut, ep_cut, [cutoffs[i] for i in missing], **kwargs)
+		for i, predictions in zip(missing, computed):
+			save(predictions, paths[i])
+			results[i] = predictions
+			evict(cache_dir, max_size, paths[i])
+
+	if isinstance(iso_cutoff, (list, tuple)): return results
+	return results[0]
+
+def cached_predict(filename, treeNum, iterations, hadron_cut = 0, ep_cut = 0, iso_cutoff = float('inf'), **kwargs):
+	"""
+	Return: List of predictions, as predict()
+	Input: same as cached_run_predict()
+	"""
+	predictions = cached_run_predict(filename, treeNum, iterations, hadron_cut, ep_cut, iso_cutoff, **kwargs)
+
+	if isinstance(iso_cutoff, (list, tuple)):
+		return [(p.tau, p.other) for p in predictions]
+	return predictions.tau, predictions.other
@@ -2,7 +2,8 @@ import argparse
 import numpy as np
 import rootpy
 from ROOT import *
-from utilities import progress
+from fourvector import FourVector, FourVectorArray
+from grid import EtaPhiGrid
 
 def create_jets(event):
 	"""
@@ -11,65 +12,66 @@ def create_jets(event):
 	"""
 	part_candidates = []
 	for part in event.pf:
-		part_candidates.append(part)
-	
+		part_candidates.append((FourVector.from_tlorentz(part[0]), part[1]))
+
+	# DeltaR < 0.4 neighbours of a seed are looked up in the 3x3 cells around it
+	grid = EtaPhiGrid([vec.Eta() for vec, _ in part_candidates], [vec.Phi() for vec, _ in part_candidates],
+	                  [vec.Pt() for vec, _ in part_candidates], 0.4)
+
 	# Sort particle candidates by Pt
-	part_candidates_sorted = sorted(part_candidates, key=lambda x: x[0].Pt())[::-1]
+	order = sorted(range(len(part_candidates)), key=lambda k: part_candidates[k][0].Pt())[::-1]
 
-	used_candidates = []
+	used = np.zeros(len(part_candidates), dtype=bool) # particles already in a jet
 	jet_candidates = []
-	for part in part_candidates_sorted:
+	for k in order:
 		if len(jet_candidates) >= 5: break # Maximum 5 jets/event
+		part = part_candidates[k]
 		# Seed critera: Charged hadron
 		#               Pt > 20
 		#               Eta < 2.5
-		if (part[1] == 211) and (abs(part[0].Eta() < 2.5)) and (part not in used_candidates):
+		if (part[1] == 211) and (abs(part[0].Eta() < 2.5)) and (not used[k]):
 			jet = []; seed = part[0]
-			jet_vecSum = TLorentzVector()
-			jet_vecSum.SetPtEtaPhiE(0., 0., 0., 0.)
+			jet_vecSum = FourVector(0., 0., 0., 0.)
 
-			for cand in part_candidates:
-				if (seed.DeltaR(cand[0]) < 0.4) and (cand not in used_candidates):
+			for i in grid.neighbours(seed.Eta(), seed.Phi()): # ascending, i.e. in tree order
+				cand = part_candidates[i]
+				if (not used[i]) and (seed.DeltaR(cand[0]) < 0.4):
 					jet_vecSum += cand[0]
 					jet.append(cand)
-					used_candidates.append(cand)
+					used[i] = True
 
 			if jet_vecSum.Pt() > 20:
 				jet_candidates.append((seed, jet))
-	
+
 	return jet_candidates
 
 def create_taus(event):
 	"""
 	Create taus from gen inputs
-	Return: List of tau candidate 4-vectors 
+	Return: FourVectorArray of tau candidates
 	"""
-	indices = []           # List of indices
-	gen_candidates = []    # List of gen candidates: (cand, index)
+	slots = {}             # tauIndex -> position in tau_vecSums
+	tau_vecSums = []       # List of tau 4-vector sums, in order of first appearance
+	hadron_decay = []      # List of Booleans: tau has a charged hadron
 	for idx, cand in enumerate(event.gen):
 		index = event.tauIndex[idx]
-		if index not in indices: indices.append(index)
-		gen_candidates.append((cand, index))
-
-	tau_candidates = []    # List of tau 4-vectors	
-	for index in indices:
-		tau_vecSum = TLorentzVector()
-		tau_vecSum.SetPtEtaPhiE(0., 0., 0., 0.)
-
-		hadron_decay = False
-		for gen_cand in gen_candidates:
-			if gen_cand[1] == index:
-				tau_vecSum += gen_cand[0][0]
-				if abs(gen_cand[0][1]) == 211:
-					hadron_decay = True
-
-		# Tau criteria: Hadronic decay
-		#               Pt < 20
-		#               Eta < 2.5
-		if (hadron_decay) and (tau_vecSum.Pt() > 20) and (abs(tau_vecSum.Eta()) < 2.5):
-			tau_candidates.append(tau_vecSum)
-	
-	return tau_candidates
+		slot = slots.get(index)
+		if slot is None:
+			slot = slots[index] = len(tau_vecSums)
+			tau_vecSums.append(FourVector(0., 0., 0., 0.))
+			hadron_decay.append(False)
+
+		tau_vecSums[slot] += FourVector.from_tlorentz(cand[0])
+		if abs(cand[1]) == 211:
+			hadron_decay[slot] = True
+
+	# Tau criteria: Hadronic decay
+	#               Pt < 20
+	#               Eta < 2.5
+	tau_candidates = [vec for vec, hadronic in zip(tau_vecSums, hadron_decay)
+	                  if (hadronic) and (vec.Pt() > 20) and (abs(vec.Eta()) < 2.5)]
+
+	return FourVectorArray.from_vectors(tau_candidates)
 
 def match_taus(jet_candidates, tau_candidates):
 	"""
@@ -77,13 +79,14 @@ def match_taus(jet_candidates, tau_candidates):
 	Return: List of jets ([jet_particles], tau)
 	"""
 	jets = []              # List of jets
-	used_candidates = []
+	used = np.zeros(len(tau_candidates), dtype=bool) # taus already matched
 	for seed, jet in jet_candidates:
 		tau = None
-		for vec in tau_candidates:
-			if (seed.DeltaR(vec) < 0.4) and (vec not in used_candidates):
+		for i in range(len(tau_candidates)):
+			vec = tau_candidates[i]
+			if (seed.DeltaR(vec) < 0.4) and (not used[i]):
 				tau = vec
-				used_candidates.append(vec)
+				used[i] = True
 				break
 		jets.append((jet, tau))
 
@@ -0,0 +1,182 @@
+import math
+import numpy as np
+
+def delta_phi(phi1, phi2):
+	"""
+	Return: phi1 - phi2 mapped into [-pi, pi)
+	Input: phi1 | Angle
+	       phi2 | Angle
+	"""
+	dphi = phi1 - phi2
+	if (-math.pi <= dphi < math.pi): return dphi
+	return (dphi + math.pi) % (2*math.pi) - math.pi
+
+def _eta(pt, pz):
+	if pt: return math.asinh(pz/pt)
+	if pz >= 0: return 10e10 # TLorentzVector convention for pt = 0
+	return -10e10
+
+class FourVector(object):
+	"""
+	Four vector in (pt, eta, phi, E) coordinates
+	Drop-in for the TLorentzVector methods used by the HPS code
+	"""
+	__slots__ = ('pt', 'eta', 'phi', 'e')
+
+	def __init__(self, pt = 0., eta = 0., phi = 0., e = 0.):
+		self.pt = pt
+		self.eta = eta
+		self.phi = phi
+		self.e = e
+
+	@classmethod
+	def from_tlorentz(cls, vec):
+		"""
+		Return: FourVector
+		Input: vec | TLorentzVector
+		"""
+		return cls(vec.Pt(), vec.Eta(), vec.Phi(), vec.E())
+
+	@classmethod
+	def from_cartesian(cls, px, py, pz, e):
+		"""
+		Return: FourVector
+		Input: px, py, pz, e | Cartesian components
+		"""
+		pt = math.sqrt(px*px + py*py)
+		phi = math.atan2(py, px) if (px or py) else 0.
+		return cls(pt, _eta(pt, pz), phi, e)
+
+	def SetPtEtaPhiE(self, pt, eta, phi, e):
+		self.pt = pt
+		self.eta = eta
+		self.phi = phi
+		self.e = e
+
+	def Pt(self):
+		return self.pt
+
+	def Eta(self):
+		return self.eta
+
+	def Phi(self):
+		return self.phi
+
+	def E(self):
+		return self.e
+
+	def Px(self):
+		return self.pt*math.cos(self.phi)
+
+	def Py(self):
+		return self.pt*math.sin(self.phi)
+
+	def Pz(self):
+		return self.pt*math.sinh(self.eta) if self.pt else 0.
+
+	def P(self):
+		return self.pt*math.cosh(self.eta) if self.pt else 0.
+
+	def M(self):
+		p = self.P()
+		mm = self.e*self.e - p*p
+		if mm < 0: return -math.sqrt(-mm)
+		return math.sqrt(mm)
+
+	def DeltaPhi(self, vec):
+		return delta_phi(self.phi, vec.phi)
+
+	def DeltaR(self, vec):
+		deta = self.eta - vec.eta
+		dphi = delta_phi(self.phi, vec.phi)
+		return math.sqrt(deta*deta + dphi*dphi)
+
+	def __add__(self, vec):
+		return FourVector.from_cartesian(self.Px() + vec.Px(), self.Py() + vec.Py(),
+		                                 self.Pz() + vec.Pz(), self.e + vec.e)
+
+	def __reduce__(self):
+		return (FourVector, (self.pt, self.eta, self.phi, self.e))
+
+	def __repr__(self):
+		return 'FourVector(pt=%g, eta=%g, phi=%g, e=%g)' % (self.pt, self.eta, self.phi, self.e)
+
+class FourVectorArray(object):
+	"""
+	Structure of arrays of four vectors in (pt, eta, phi, E) coordinates
+	"""
+	__slots__ = ('pt', 'eta', 'phi', 'e')
+
+	def __init__(self, pt, eta, phi, e):
+		self.pt = np.asarray(pt, dtype = np.float64)
+		self.eta = np.asarray(eta, dtype = np.float64)
+		self.phi = np.asarray(phi, dtype = np.float64)
+		self.e = np.asarray(e, dtype = np.float64)
+
+	@classmethod
+	def from_vectors(cls, vectors):
+		"""
+		Return: FourVectorArray
+		Input: vectors | List of FourVectors
+		"""
+		return cls([v.pt for v in vectors], [v.eta for v in vectors],
+		           [v.phi for v in vectors], [v.e for v in vectors])
+
+	@classmethod
+	def from_cartesian(cls, px, py, pz, e):
+		"""
+		Return: FourVectorArray
+		Input: px, py, pz, e | Arrays of cartesian components
+		"""
+		pt = np.hypot(px, py)
+		with np.errstate(divide = 'ignore', invalid = 'ignore'):
+			eta = np.where(pt > 0, np.arcsinh(pz/np.where(pt > 0, pt, 1.)), np.where(pz >= 0, 10e10, -10e10))
+		return cls(pt, eta, np.arctan2(py, px), e)
+
+	def __len__(self):
+		return len(self.pt)
+
+	def __getitem__(self, i):
+		if isinstance(i, (int, np.integer)):
+			return FourVector(float(self.pt[i]), float(self.eta[i]), float(self.phi[i]), float(self.e[i]))
+		return FourVectorArray(self.pt[i], self.eta[i], self.phi[i], self.e[i])
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self[i]
+
+	def Pt(self):
+		return self.pt
+
+	def Eta(self):
+		return self.eta
+
+	def Phi(self):
+		return self.phi
+
+	def E(self):
+		return self.e
+
+	def Px(self):
+		return self.pt*np.cos(self.phi)
+
+	def Py(self):
+		return self.pt*np.sin(self.phi)
+
+	def Pz(self):
+		return np.where(self.pt > 0, self.pt*np.sinh(np.where(self.pt > 0, self.eta, 0.)), 0.)
+
+	def M(self):
+		p = np.hypot(self.pt, self.Pz())
+		mm = self.e*self.e - p*p
+		return np.sign(mm)*np.sqrt(np.abs(mm))
+
+	def DeltaPhi(self, vec):
+		return (self.phi - vec.phi + np.pi) % (2*np.pi) - np.pi
+
+	def DeltaR(self, vec):
+		return np.hypot(self.eta - vec.eta, self.DeltaPhi(vec))
+
+	def __add__(self, vec):
+		return FourVectorArray.from_cartesian(self.Px() + vec.Px(), self.Py() + vec.Py(),
+		                                      self.Pz() + vec.Pz(), self.e + vec.e)
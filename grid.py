@@ -0,0 +1,102 @@
+import math
+import numpy as np
+from utilities import profiling
+import kernels
+
+def wrap_phi(dphi):
+	"""
+	Return: Angle(s) mapped into [-pi, pi)
+	Input: dphi | Angle or array of angles
+	"""
+	return (dphi + math.pi) % (2*math.pi) - math.pi
+
+class EtaPhiGrid(object):
+	"""
+	Particles binned into (eta, phi) cells at least as wide as the cone radius,
+	so a cone query only has to look at the 3x3 cells around its centre.
+	Phi cells wrap around at +/- pi.
+	"""
+	def __init__(self, eta, phi, pt, radius = 0.4):
+		"""
+		Input: eta    | Particle etas
+		       phi    | Particle phis
+		       pt     | Particle pts
+		       radius | Cone radius the grid is built for
+		"""
+		self.eta = np.asarray(eta, dtype = np.float64)
+		self.phi = np.asarray(phi, dtype = np.float64)
+		self.pt = np.asarray(pt, dtype = np.float64)
+		self.radius = radius
+
+		self.num_phi = max(1, int(2*math.pi/radius)) # number of phi cells
+		self.phi_width = 2*math.pi/self.num_phi
+
+		# cell -> particle indices (ascending)
+		self.cells = {}
+		if len(self.eta):
+			ieta, iphi = self._cell(self.eta, self.phi)
+			keys = ieta*self.num_phi + iphi
+			order = np.argsort(keys, kind = 'mergesort')
+			sorted_keys = keys[order]
+			bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+			for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(order)]):
+				key = int(sorted_keys[lo])
+				self.cells[(key//self.num_phi, key % self.num_phi)] = order[lo:hi]
+
+	def __len__(self):
+		return len(self.eta)
+
+	def _cell(self, eta, phi):
+		ieta = np.floor(np.asarray(eta)/self.radius).astype(np.int64)
+		iphi = np.floor((wrap_phi(np.asarray(phi)) + math.pi)/self.phi_width).astype(np.int64) % self.num_phi
+		return (ieta, iphi)
+
+	def neighbours(self, eta, phi):
+		"""
+		Return: Sorted indices of particles in the 3x3 cells around (eta, phi)
+		Input: eta | Cone centre eta
+		       phi | Cone centre phi
+		"""
+		ieta, iphi = self._cell(eta, phi)
+		phi_cells = set((int(iphi) + d) % self.num_phi for d in (-1, 0, 1))
+
+		found = []
+		for i in (ieta - 1, ieta, ieta + 1):
+			for j in phi_cells:
+				cell = self.cells.get((int(i), j))
+				if cell is not None: found.append(cell)
+
+		if not found: return np.zeros(0, dtype = np.int64)
+		return np.sort(np.concatenate(found))
+
+	def cone_sums(self, etas, phis, radius = None):
+		"""
+		Return: Array of summed particle pt inside each cone
+		Input: etas   | Cone centre etas
+		       phis   | Cone centre phis
+		       radius | Cone radius (at most the grid radius)
+		"""
+		if radius is None: radius = self.radius
+		etas = np.asarray(etas, dtype = np.float64)
+		phis = np.asarray(phis, dtype = np.float64)
+
+		# gather every (cone, particle) pair from the neighbouring cells ...
+		cones = []; parts = []
+		for c in range(len(etas)):
+			idx = self.neighbours(etas[c], phis[c])
+			cones.append(np.full(len(idx), c, dtype = np.int64))
+			parts.append(idx)
+
+		if not cones: return np.zeros(0)
+		cones = np.concatenate(cones); parts = np.concatenate(parts)
+
+		prof = profiling.active()
+		if prof: prof.count('isolation particles scanned', len(parts))
+
+		if kernels.active(): return kernels.cone_sums(self.eta, self.phi, self.pt, cones, parts, etas, phis, radius)
+
+		# ... then test all pairs at once
+		dr2 = (self.eta[parts] - etas[cones])**2 + wrap_phi(self.phi[parts] - phis[cones])**2
+		inside = dr2 < radius*radius
+
+		return np.bincount(cones[inside], weights = self.pt[parts[inside]], minlength = len(etas))
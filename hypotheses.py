@@ -0,0 +1,368 @@
+import math, itertools, time, collections, operator
+import numpy as np
+from fourvector import FourVector
+from utilities import profiling
+import kernels
+
+def _all(tests):
+	return reduce(operator.and_, tests)
+
+def _any(tests):
+	return reduce(operator.or_, tests)
+
+def _charged(charges, signs):
+	"""
+	Return: Boolean (array): every hadron constituent has charge +/-1
+	"""
+	return _all([abs(c) == 1 for c in charges])
+
+def _opposite_signs(charges, signs):
+	"""
+	Return: Boolean (array): no neutral hadron and PDG IDs of both signs
+	"""
+	return _all([c != 0 for c in charges]) & _any([sign < 0 for sign in signs]) & _any([sign > 0 for sign in signs])
+
+Hypothesis = collections.namedtuple('Hypothesis', ['guess', 'constituents', 'window', 'rule', 'alone'])
+
+# decay mode hypotheses, the single definition every selection path reads
+#   constituents | 'h' hadron, 's' strip
+#   window       | (mass_low, scale, cap): mass_low < M < min(max(scale*sqrt(pt/100), scale), cap),
+#                  None for no mass or DeltaR check
+#   rule         | function of the hadron constituents' (charges, signs), scalars or arrays
+#   alone        | the constituents must be every candidate of the jet
+HYPOTHESES = [
+	Hypothesis('1', 'hhh', (0.8, 1.5, 1.5), _opposite_signs, False), # h+/-, h-/+, h-/+
+	Hypothesis('2', 'hss', (0.4, 1.2, 4.0), _charged, False),        # h+/-, pi0, pi0
+	Hypothesis('3', 'hs', (0.3, 1.3, 4.2), _charged, False),         # h+/-, pi0
+	Hypothesis('4', 'h', None, _charged, True),                      # single h+/-
+]
+BY_GUESS = dict((h.guess, h) for h in HYPOTHESES)
+
+# every constituent lies within DeltaR < CONE/pt of the summed four vector
+CONE = 3.0
+
+def mass_high(window, pt):
+	"""
+	Return: Upper mass bound of the window at summed Pt pt
+	"""
+	_, scale, cap = window
+	return min(max(scale*math.sqrt(pt/100), scale), cap)
+
+_tables = {} # cached index tables keyed by (hadron slots, strip slots)
+
+def index_tables(num_hadrons, num_strips):
+	"""
+	Return: Dictionary of guess ID -> tuple of index arrays, one per constituent
+	        e.g. '1': (h, h, h) triples, '2': (h, s, s), '3': (h, s), '4': (h,)
+	Input: num_hadrons | Hadron slots per jet
+	       num_strips  | Strip slots per jet
+
+	Rows follow itertools.combinations order (hadrons outer, strips inner),
+	so the first maximum of a hypothesis is the same combination predict()
+	used to keep
+	"""
+	key = (num_hadrons, num_strips)
+	if key not in _tables:
+		_tables[key] = {}
+		for hyp in HYPOTHESES:
+			rows = [hs + ss for hs in itertools.combinations(range(num_hadrons), hyp.constituents.count('h'))
+			        for ss in itertools.combinations(range(num_strips), hyp.constituents.count('s'))]
+			width = len(hyp.constituents)
+			table = np.array(rows, dtype = np.int64).reshape(len(rows), width)
+			_tables[key][hyp.guess] = tuple(table[:, c] for c in range(width))
+	return _tables[key]
+
+class CandidatePool(object):
+	"""
+	Selected candidates of one jet, read by every hypothesis
+	"""
+	__slots__ = ('jet_num', 'hadrons', 'ep', 'strips')
+
+	def __init__(self, jet_num, hadrons, ep, strips):
+		self.jet_num = jet_num
+		self.hadrons = hadrons # list of (index, 4vec, charge, PDG sign), ascending Pt, at most 5
+		self.ep = ep           # list of (index, 4vec), descending Pt
+		self.strips = strips   # list of strip four vectors
+
+class CandidateBatch(object):
+	"""
+	Hadron and strip candidates of many jets packed into padded arrays
+	"""
+	def __init__(self, pools):
+		"""
+		Input: pools | List of CandidatePools
+		"""
+		self.size = len(pools)
+		self.num_hadrons = max([len(pool.hadrons) for pool in pools] + [0])
+		self.num_strips = max([len(pool.strips) for pool in pools] + [0])
+
+		shape_h = (self.size, self.num_hadrons)
+		shape_s = (self.size, self.num_strips)
+
+		self.hadrons = np.zeros(shape_h + (4,)) # pt, eta, phi, e
+		self.sign = np.zeros(shape_h)
+		self.charge = np.zeros(shape_h)
+		self.hadron_valid = np.zeros(shape_h, dtype = bool)
+		self.strips = np.zeros(shape_s + (4,))
+		self.strip_valid = np.zeros(shape_s, dtype = bool)
+
+		for j, pool in enumerate(pools):
+			for i, (_, vec, charge, sign) in enumerate(pool.hadrons):
+				self.hadrons[j, i] = (vec.pt, vec.eta, vec.phi, vec.e)
+				self.sign[j, i], self.charge[j, i] = sign, charge
+				self.hadron_valid[j, i] = True
+			for i, vec in enumerate(pool.strips):
+				self.strips[j, i] = (vec.pt, vec.eta, vec.phi, vec.e)
+				self.strip_valid[j, i] = True
+
+def _cartesian(vectors):
+	pt, eta, phi, e = vectors[..., 0], vectors[..., 1], vectors[..., 2], vectors[..., 3]
+	return (pt*np.cos(phi), pt*np.sin(phi), pt*np.sinh(eta), e)
+
+def _combine(constituents, valid, window):
+	"""
+	Return: (pass mask, summed pt, summed (px, py, pz, e), constituent pt sum)
+	Input: constituents | List of (jets, combinations, 4) arrays
+	       valid        | (jets, combinations) mask of allowed combinations
+	       window       | (mass_low, scale, cap) of the hypothesis
+	"""
+	mass_low, scale, cap = window
+	if kernels.active(): return kernels.combine(constituents, valid, mass_low, scale, cap, CONE)
+
+	parts = [_cartesian(c) for c in constituents]
+	px, py, pz, e = [sum(p[i] for p in parts) for i in range(4)]
+
+	pt = np.hypot(px, py)
+	mm = e*e - (px*px + py*py + pz*pz)
+	mass = np.sign(mm)*np.sqrt(np.abs(mm))
+
+	with np.errstate(divide = 'ignore', invalid = 'ignore'):
+		high = np.minimum(np.maximum(scale*np.sqrt(pt/100), scale), cap)
+		passed = valid & (mass_low < mass) & (mass < high)
+
+		# every constituent within DeltaR < CONE/pt of the sum
+		eta = np.arcsinh(pz/pt)
+		phi = np.arctan2(py, px)
+		dr_cut = CONE/pt
+		for c in constituents:
+			dphi = (c[..., 2] - phi + np.pi) % (2*np.pi) - np.pi
+			passed &= ~(np.hypot(c[..., 1] - eta, dphi) > dr_cut)
+
+	pt_sum = sum(c[..., 0] for c in constituents)
+	return (passed, pt, (px, py, pz, e), pt_sum)
+
+def _best(hypothesis, passed, pt, p4, pt_sum, best):
+	"""
+	Store the highest pt passing combination of each jet in best
+	"""
+	if not passed.size: return
+	score = np.where(passed, pt, -np.inf)
+	choice = np.argmax(score, axis = 1)
+	rows = np.arange(len(choice))
+
+	for j in np.flatnonzero(passed[rows, choice]):
+		c = choice[j]
+		vec_sum = FourVector.from_cartesian(*[float(x[j, c]) for x in p4])
+		best[j].append((hypothesis, (float(pt_sum[j, c]), vec_sum)))
+
+def evaluate(batch):
+	"""
+	Return: List per jet of [(guess ID, (pt_sum, 4vec))], one entry per hypothesis that fired
+	Input: batch | CandidateBatch
+	"""
+	prof = profiling.active()
+	if prof: t0 = time.time()
+
+	best = [[] for _ in range(batch.size)]
+	tables = index_tables(batch.num_hadrons, batch.num_strips)
+	slots = {'h': (batch.hadrons, batch.hadron_valid), 's': (batch.strips, batch.strip_valid)}
+
+	for hyp in HYPOTHESES:
+		columns = tables[hyp.guess]
+		if len(columns[0]):
+			hadrons = [col for kind, col in zip(hyp.constituents, columns) if (kind == 'h')]
+			valid = _all([slots[kind][1][:, col] for kind, col in zip(hyp.constituents, columns)])
+			valid &= hyp.rule([batch.charge[:, col] for col in hadrons], [batch.sign[:, col] for col in hadrons])
+			if hyp.alone:
+				valid &= ((batch.hadron_valid.sum(axis = 1) == hyp.constituents.count('h')) &
+				          (batch.strip_valid.sum(axis = 1) == hyp.constituents.count('s')))[:, None]
+
+			if hyp.window is None: # the constituent is the candidate
+				for j, c in zip(*np.nonzero(valid)):
+					pt, eta, phi, e = [float(x) for x in batch.hadrons[j, hadrons[0][c]]]
+					best[j].append((hyp.guess, (pt, FourVector(pt, eta, phi, e))))
+			else:
+				parts = [slots[kind][0][:, col] for kind, col in zip(hyp.constituents, columns)]
+				_best(hyp.guess, *(_combine(parts, valid, hyp.window) + (best,)))
+			if prof: prof.count('combinations tried (hypothesis %s)' % hyp.guess, int(valid.sum()))
+		if prof: t1 = time.time(); prof.add('hypothesis' + hyp.guess, t1 - t0); t0 = t1
+
+	return best
+
+def best_candidates(pools):
+	"""
+	Return: List per jet of (guess ID, (pt_sum, 4vec)) of the highest Pt hypothesis, or None
+	Input: pools | List of CandidatePools
+	"""
+	prof = profiling.active()
+	if prof: t0 = time.time()
+	batch = CandidateBatch(pools)
+	if prof: prof.add('pack candidates', time.time() - t0)
+
+	results = []
+	for max_pt in evaluate(batch):
+		if max_pt: results.append(max(max_pt, key = lambda x: x[1][1].Pt()))
+		else: results.append(None)
+	return results
+
+class PlannerStats(object):
+	"""
+	Counters of the branch-and-bound planner
+	"""
+	def __init__(self):
+		self.tried = 0   # combinations evaluated
+		self.pruned = 0  # combinations skipped by the pt bound
+		self.skipped = 0 # hypotheses skipped by preconditions or bound
+
+	def merge(self, other):
+		"""
+		Return: None
+		Input: other | PlannerStats added to these counters
+		"""
+		self.tried += other.tried
+		self.pruned += other.pruned
+		self.skipped += other.skipped
+
+	def __str__(self):
+		return 'Combinations tried: %d, pruned: %d, hypotheses skipped: %d' % (self.tried, self.pruned, self.skipped)
+
+# |vec_sum| never exceeds the constituent pt sum by more than rounding
+_SLACK = 1 + 1e-9
+
+def _check(candidates, window):
+	"""
+	Return: Summed four vector if the combination passes, else None
+	Input: candidates | Tuple of constituent four vectors
+	       window     | (mass_low, scale, cap) of the hypothesis, None for no checks
+	"""
+	vec_sum = candidates[0]
+	for vec in candidates[1:]:
+		vec_sum = vec_sum + vec
+	if window is None: return vec_sum
+
+	if window[0] < vec_sum.M() < mass_high(window, vec_sum.Pt()): # mass check
+		DeltaR_cut = CONE/vec_sum.Pt()
+		if (not any(vec_sum.DeltaR(c2) > DeltaR_cut for c2 in candidates)): # deltaR check
+			return vec_sum
+	return None
+
+def combinations(pool, hyp):
+	"""
+	Return: List of (rank, constituent four vectors) of the allowed combinations
+	Input: pool | CandidatePool of the jet
+	       hyp  | Hypothesis
+
+	rank is the row of the combination in index_tables()
+	"""
+	hadrons = pool.hadrons; strips = pool.strips
+	if hyp.alone and ((len(hadrons), len(strips)) != (hyp.constituents.count('h'), hyp.constituents.count('s'))):
+		return []
+
+	result = []
+	columns = index_tables(len(hadrons), len(strips))[hyp.guess]
+	for rank in range(len(columns[0])):
+		row = [int(col[rank]) for col in columns]
+		members = [hadrons[i] for kind, i in zip(hyp.constituents, row) if (kind == 'h')]
+		if hyp.rule([m[2] for m in members], [m[3] for m in members]):
+			result.append((rank, tuple(hadrons[i][1] if (kind == 'h') else strips[i] for kind, i in zip(hyp.constituents, row))))
+	return result
+
+def guesses(pool, guess):
+	"""
+	Return: List of (pt_sum, 4vec) of every passing combination of one hypothesis
+	Input: pool  | CandidatePool of the jet
+	       guess | Guess ID
+	"""
+	hyp = BY_GUESS[guess]
+	result = []
+	for _, candidates in combinations(pool, hyp):
+		vec_sum = _check(candidates, hyp.window)
+		if vec_sum is not None: result.append((sum(c.Pt() for c in candidates), vec_sum))
+	return result
+
+def plan(pool, stats = None):
+	"""
+	Return: (guess ID, (pt_sum, 4vec)) of the highest Pt hypothesis, or None
+	Input: pool  | CandidatePool of the jet
+	       stats | PlannerStats to update
+
+	Hypotheses run cheapest first and keep a running best; a combination
+	(or a whole hypothesis) is skipped when the sum of its constituent pts
+	cannot reach the best pt so far. Ties resolve as in predict(): lowest
+	hypothesis number, then first combination.
+	"""
+	if stats is None: stats = PlannerStats()
+
+	best = None # (pt, hypothesis, combination rank, result)
+	prof = profiling.active()
+
+	for hyp in sorted(HYPOTHESES, key = lambda h: len(h.constituents)): # cheapest first
+		bounded = sorted(((sum(c.Pt() for c in cands), rank, cands) for rank, cands in combinations(pool, hyp)),
+		                 key = lambda x: -x[0])
+		if (not bounded) or ((best is not None) and (bounded[0][0]*_SLACK < best[0])):
+			stats.skipped += 1
+			continue
+
+		for n, (bound, rank, cands) in enumerate(bounded):
+			if (best is not None) and (bound*_SLACK < best[0]):
+				stats.pruned += len(bounded) - n
+				break
+
+			stats.tried += 1
+			if prof: prof.count('combinations tried (hypothesis %s)' % hyp.guess)
+			vec_sum = _check(cands, hyp.window)
+			if vec_sum is None: continue
+
+			pt = vec_sum.Pt()
+			if (best is None) or (pt > best[0]) or ((pt == best[0]) and ((hyp.guess, rank) < best[1:3])):
+				best = (pt, hyp.guess, rank, (hyp.guess, (bound, vec_sum)))
+
+	if best is None: return None
+	return best[3]
+
+def pt_bound(pool):
+	"""
+	Return: Upper bound on the Pt of any hypothesis of the jet
+	Input: pool | CandidatePool of the jet
+
+	Every hypothesis combines at most three hadrons, or one hadron and at
+	most two strips, and |vec_sum| never exceeds its constituent pt sum
+	"""
+	if not pool.hadrons: return 0. # every hypothesis needs a hadron
+
+	hadrons = [vec.pt for _, vec, _, _ in pool.hadrons] # ascending Pt
+	strips = sorted([vec.pt for vec in pool.strips])[::-1]
+	return (sum(hadrons[-3:]) + sum(strips[:2]))*_SLACK
+
+def first_candidate(pool):
+	"""
+	Return: (guess ID, (pt_sum, 4vec)) of the first passing hypothesis found, or None
+	Input: pool | CandidatePool of the jet
+
+	Only tells whether any hypothesis fires; the candidate returned is
+	not the highest Pt one
+	"""
+	for hyp in sorted(HYPOTHESES, key = lambda h: len(h.constituents)): # cheapest first
+		for _, candidates in combinations(pool, hyp):
+			vec_sum = _check(candidates, hyp.window)
+			if vec_sum is not None: return (hyp.guess, (sum(c.Pt() for c in candidates), vec_sum))
+
+	return None
+
+def best_candidates_planned(pools, stats = None):
+	"""
+	Return: List per jet of (guess ID, (pt_sum, 4vec)) of the highest Pt hypothesis, or None
+	Input: pools | List of CandidatePools
+	       stats | PlannerStats to update
+	"""
+	return [plan(pool, stats) for pool in pools]
@@ -0,0 +1,91 @@
+import numpy as np
+
+class JaggedArray(object):
+	"""
+	Flat content array plus per-event offsets
+	Event i owns content[offsets[i]:offsets[i + 1]]
+	"""
+	__slots__ = ('content', 'offsets')
+
+	def __init__(self, content, offsets):
+		"""
+		Input: content | Flat array of values for all events
+		       offsets | Array of len(events) + 1 boundaries into content
+		"""
+		self.content = content
+		self.offsets = offsets
+
+	@classmethod
+	def from_objects(cls, column):
+		"""
+		Return: JaggedArray
+		Input: column | Object array with one variable-length array per event
+		"""
+		offsets = np.zeros(len(column) + 1, dtype = np.int64)
+		np.cumsum([len(x) for x in column], out = offsets[1:])
+
+		if offsets[-1]: content = np.concatenate(column)
+		else: content = np.zeros(0)
+
+		return cls(content, offsets)
+
+	def __len__(self):
+		return len(self.offsets) - 1
+
+	def __getitem__(self, i):
+		return self.content[self.offsets[i]:self.offsets[i + 1]]
+
+	def counts(self):
+		"""
+		Return: Array of per-event lengths
+		"""
+		return np.diff(self.offsets)
+
+class EventView(object):
+	"""
+	Event-like access to one entry of a Chunk
+	Branches are plain attributes holding Python lists, sliced once when
+	the view is made, so the HPS stages index them element by element
+	exactly as they index PyROOT events
+	"""
+	def __init__(self, chunk, entry):
+		for branch, (content, offsets) in chunk.columns.items():
+			setattr(self, branch, content[offsets[entry]:offsets[entry + 1]])
+
+class Chunk(object):
+	"""
+	Block of consecutive events read in one call
+	"""
+	def __init__(self, arrays):
+		"""
+		Input: arrays | Dictionary of branch name -> JaggedArray
+		"""
+		self.arrays = arrays
+		self.size = len(next(iter(arrays.values()))) if arrays else 0
+
+		# list conversion happens once per chunk, not once per element access
+		self.columns = {}
+		for branch, jagged in arrays.items():
+			self.columns[branch] = (jagged.content.tolist(), jagged.offsets.tolist())
+
+	def __len__(self):
+		return self.size
+
+	def __iter__(self):
+		for entry in range(self.size):
+			yield EventView(self, entry)
+
+def read_chunks(tree, branches, stop, chunk_size = 5000, start = 0):
+	"""
+	Return: Generator of Chunks
+	Input: tree       | ROOT TTree
+	       branches   | List of branch names to read
+	       stop       | Entry to stop before
+	       chunk_size | Number of entries per chunk
+	       start      | First entry to read
+	"""
+	from root_numpy import tree2array
+
+	for first in range(start, stop, chunk_size):
+		records = tree2array(tree, branches = branches, start = first, stop = min(first + chunk_size, stop))
+		yield Chunk(dict((b, JaggedArray.from_objects(records[b])) for b in branches))
@@ -0,0 +1,230 @@
+import math, os, argparse
+import numpy as np
+
+try:
+	from numba import njit
+except ImportError:
+	njit = None
+
+# loop kernels over flat arrays, written in the subset of Python numba compiles
+
+def _combine_loops(C, valid, mass_low, scale, cap, cone, passed, pt, px, py, pz, e, pt_sum):
+	"""
+	Mass and DeltaR checks of every (jet, combination), see hypotheses._combine()
+	C is (constituents, jets, combinations, 4) of pt, eta, phi, e
+	"""
+	k = C.shape[0]; n = C.shape[1]; m = C.shape[2]
+	for j in range(n):
+		for c in range(m):
+			passed[j, c] = False
+			if not valid[j, c]: continue
+
+			sx = 0.; sy = 0.; sz = 0.; se = 0.; sp = 0.
+			for i in range(k):
+				cpt = C[i, j, c, 0]
+				sx += cpt*math.cos(C[i, j, c, 2])
+				sy += cpt*math.sin(C[i, j, c, 2])
+				sz += cpt*math.sinh(C[i, j, c, 1])
+				se += C[i, j, c, 3]
+				sp += cpt
+			px[j, c] = sx; py[j, c] = sy; pz[j, c] = sz; e[j, c] = se; pt_sum[j, c] = sp
+
+			vpt = math.hypot(sx, sy)
+			pt[j, c] = vpt
+			if not (vpt > 0): continue # the scalar path cannot evaluate cone/pt either
+
+			mm = se*se - (sx*sx + sy*sy + sz*sz)
+			if (mm > 0): mass = math.sqrt(mm)
+			elif (mm < 0): mass = -math.sqrt(-mm)
+			else: mass = 0.
+			high = min(max(scale*math.sqrt(vpt/100), scale), cap)
+			if not ((mass_low < mass) and (mass < high)): continue
+
+			eta = math.asinh(sz/vpt)
+			phi = math.atan2(sy, sx)
+			dr_cut = cone/vpt
+			ok = True
+			for i in range(k):
+				dphi = (C[i, j, c, 2] - phi + math.pi) % (2*math.pi) - math.pi
+				if (math.hypot(C[i, j, c, 1] - eta, dphi) > dr_cut):
+					ok = False
+					break
+			passed[j, c] = ok
+
+def _cone_sums_loops(eta, phi, pt, cones, parts, etas, phis, radius, sums):
+	"""
+	Summed pt of the (cone, particle) pairs inside the radius, see EtaPhiGrid.cone_sums()
+	"""
+	r2 = radius*radius
+	for i in range(len(cones)):
+		c = cones[i]; p = parts[i]
+		deta = eta[p] - etas[c]
+		dphi = (phi[p] - phis[c] + math.pi) % (2*math.pi) - math.pi
+		if (deta*deta + dphi*dphi < r2):
+			sums[c] += pt[p]
+
+def _strips_loops(pts, etas, phis, es, max_seeds, out):
+	"""
+	Strip building of strips.gen_strips(), return: number of rows of out filled
+	"""
+	total_num = len(pts)
+	count = 0
+	for i in range(min(max_seeds, total_num)):
+		pt = pts[i]; eta = etas[i]; phi = phis[i]; E = es[i]
+		sum_pt = 0.; sum_eta = 0.; sum_phi = 0.; sum_E = 0.
+
+		last = i
+		while True:
+			# first later candidate inside the current eta window and phi road
+			j = -1
+			for k in range(last + 1, total_num):
+				if (etas[k] > eta - 0.025) and (etas[k] < eta + 0.025):
+					dphi = phis[k] - phi
+					if not ((-math.pi <= dphi) and (dphi < math.pi)):
+						dphi = (dphi + math.pi) % (2*math.pi) - math.pi
+					if (dphi < 0.10):
+						j = k
+						break
+			if (j < 0): break
+			last = j
+
+			sum_pt += pts[j]; sum_eta += etas[j]*pts[j]; sum_phi += phis[j]*pts[j]; sum_E += es[j]
+
+			total_pt = pt + sum_pt
+			eta = (eta*pt + sum_eta)/total_pt
+			phi = (phi*pt + sum_phi)/total_pt
+			E = E + sum_E
+			pt = total_pt
+
+		if (pt > 2.5):
+			out[count, 0] = pt; out[count, 1] = eta; out[count, 2] = phi; out[count, 3] = E
+			count += 1
+	return count
+
+def _compile(function):
+	return njit(cache = True, error_model = 'numpy')(function)
+
+_LOOPS = {'combine': _combine_loops, 'cone_sums': _cone_sums_loops, 'strips': _strips_loops}
+_compiled = None # kernels compiled on first use
+_backend = None  # kernels in use, None for the NumPy/Python path
+
+def available():
+	"""
+	Return: Boolean, numba is installed
+	"""
+	return njit is not None
+
+def enable(flag = True, interpreted = False):
+	"""
+	Return: Boolean, kernels are in use
+	Input: flag        | Use the kernels
+	       interpreted | Run the kernels uncompiled (slow, for checking without numba)
+	"""
+	global _backend, _compiled
+
+	if not flag: _backend = None
+	elif interpreted: _backend = _LOOPS
+	elif available():
+		if _compiled is None: _compiled = dict((name, _compile(f)) for name, f in _LOOPS.items())
+		_backend = _compiled
+	else: _backend = None
+	return _backend is not None
+
+def active():
+	"""
+	Return: Boolean, kernels are in use
+	"""
+	return _backend is not None
+
+def combine(constituents, valid, mass_low, scale, cap, cone):
+	"""
+	Return: (pass mask, summed pt, summed (px, py, pz, e), constituent pt sum), as hypotheses._combine()
+	Input: constituents | List of (jets, combinations, 4) arrays
+	       valid        | (jets, combinations) mask of allowed combinations
+	       mass_low     | Lower mass bound
+	       scale, cap   | Upper mass bound min(max(scale*sqrt(pt/100), scale), cap)
+	       cone         | Constituents lie within DeltaR < cone/pt of the sum
+	"""
+	C = np.ascontiguousarray(np.stack(constituents), dtype = np.float64)
+	shape = valid.shape
+
+	passed = np.zeros(shape, dtype = bool)
+	pt, px, py, pz, e, pt_sum = [np.zeros(shape) for _ in range(6)]
+	_backend['combine'](C, np.ascontiguousarray(valid), float(mass_low), float(scale), float(cap), float(cone),
+	                    passed, pt, px, py, pz, e, pt_sum)
+	return (passed, pt, (px, py, pz, e), pt_sum)
+
+def cone_sums(eta, phi, pt, cones, parts, etas, phis, radius):
+	"""
+	Return: Array of summed pt per cone, as EtaPhiGrid.cone_sums()
+	Input: eta, phi, pt | Particle arrays of the grid
+	       cones, parts | (cone, particle) index pairs
+	       etas, phis   | Cone centres
+	       radius       | Cone radius
+	"""
+	sums = np.zeros(len(etas))
+	_backend['cone_sums'](eta, phi, pt, cones, parts, etas, phis, float(radius), sums)
+	return sums
+
+def strips(pts, etas, phis, es, max_seeds):
+	"""
+	Return: (strips, 4) array of strip pt, eta, phi, e, as strips.gen_strips()
+	Input: pts, etas, phis, es | Candidate arrays (descending Pt)
+	       max_seeds           | Number of leading candidates used as strip seeds
+	"""
+	out = np.zeros((max(min(max_seeds, len(pts)), 0), 4))
+	count = _backend['strips'](np.asarray(pts, dtype = np.float64), np.asarray(etas, dtype = np.float64),
+	                           np.asarray(phis, dtype = np.float64), np.asarray(es, dtype = np.float64),
+	                           max_seeds, out)
+	return out[:count]
+
+def parity(events, hadron_cut = 0.5, ep_cut = 0.5, iso_cutoff = float('inf'), interpreted = False):
+	"""
+	Return: (number of jets, number of jets whose tau decision or guess differs)
+	Input: events      | List of events
+	       hadron_cut  | Pt cutoff for hadrons
+	       ep_cut      | Pt cutoff for electrons/photons
+	       iso_cutoff  | Isolation cutoff
+	       interpreted | Check the uncompiled kernels
+	"""
+	global _backend
+	from predict import prepare_event, classify_batch, Predictions
+
+	def decisions():
+		prepared = [prepare_event(event, hadron_cut, ep_cut) for event in events]
+		predictions = Predictions()
+		classify_batch(prepared, iso_cutoff, predictions)
+		taus = [(ID, guess, round(vec.Pt(), 6)) for ID, guess, vec in predictions.tau]
+		other = [(ID, round(vec.Pt(), 6)) for ID, vec in predictions.other]
+		return taus, other, predictions.accuracy
+
+	previous = _backend
+	try:
+		enable(False)
+		reference = decisions()
+		if not enable(True, interpreted): raise RuntimeError('numba is not installed')
+		result = decisions()
+	finally:
+		_backend = previous
+
+	differ = 0
+	for a, b in zip(reference[:2], result[:2]):
+		differ += sum(x != y for x, y in zip(a, b)) + abs(len(a) - len(b))
+	return int(reference[2][1]), differ
+
+# on by default when numba is installed, HPS_NUMBA=0 turns it off
+enable(available() and os.environ.get('HPS_NUMBA', '1') != '0')
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-n', '--number', dest='number', type=int, default=2000, help='number of synthetic events')
+	parser.add_argument('-s', '--seed', dest='seed', type=int, default=0, help='random seed')
+	parser.add_argument('--interpreted', dest='interpreted', action='store_true', help='check the uncompiled kernels')
+	options = parser.parse_args()
+
+	import kernels # the module the HPS stages consult, not this __main__ copy
+	from utilities.synthetic import generate_events
+
+	jets, differ = kernels.parity(generate_events(options.number, options.seed), interpreted = options.interpreted)
+	print 'Jets: ', jets, 'tau decisions differing: ', differ
+	if differ: raise SystemExit(1)
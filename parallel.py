@@ -0,0 +1,90 @@
+import time
+import multiprocessing
+from sources import open_source, EventSource
+from predict import read_events, run_events, print_summary, working_points
+
+def shard_ranges(total, shards):
+	"""
+	Return: List of (start, count) entry ranges covering [0, total) in order
+	Input: total  | Number of entries
+	       shards | Number of ranges
+	"""
+	shards = max(1, min(shards, total))
+	size, extra = divmod(total, shards)
+
+	ranges = []; start = 0
+	for i in range(shards):
+		count = size + (1 if i < extra else 0)
+		ranges.append((start, count))
+		start += count
+	return ranges
+
+def _run_shard(args):
+	"""
+	Return: Predictions of one entry range
+	Input: args | (filename, treeNum, start, count, hadron_cut, ep_cut, iso_cutoff, engine, chunk_size, selection, max_seeds)
+	"""
+	filename, treeNum, start, count, hadron_cut, ep_cut, iso_cutoff, engine, chunk_size, selection, max_seeds = args
+
+	# every worker opens its own file
+	events = read_events(filename, treeNum, count, engine, chunk_size, start)
+	return run_events(events, count, hadron_cut, ep_cut, iso_cutoff, chunk_size, selection, progress = False, max_seeds = max_seeds)
+
+def predict_parallel(filename, treeNum, iterations, hadron_cut = 0, ep_cut = 0, iso_cutoff = float('inf'),
+                     workers = None, shards = None, engine = 'event', chunk_size = 5000, selection = 'batch', max_seeds = 6):
+	"""
+	Return: Same as predict(), identical to a serial run
+	Input: filename   | ROOT file, .npz file, event store or an EventSource reading one of them
+	                    (workers reopen the path; in-memory sources raise ValueError)
+	       treeNum    | ROOT tree number
+	       iterations | Number of events to consider
+	       hadron_cut | Pt cutoff for hadrons
+	       ep_cut     | Pt cutoff for electrons/photons
+	       iso_cutoff | Isolation cutoff or list of cutoffs
+	       workers    | Number of processes (default: number of cores)
+	       shards     | Number of entry ranges (default: 4 per worker)
+	       engine     | 'event' (PyROOT iteration) or 'columnar' (chunked bulk read)
+	       chunk_size | Number of events per bulk read and hypothesis batch
+	       selection  | 'batch' (vectorized hypotheses) or 'bound' (branch-and-bound planner)
+	       max_seeds  | Number of leading electron/photon candidates used as strip seeds per jet
+	"""
+	if isinstance(filename, EventSource): # workers only receive the path, never the events
+		if filename.path is None:
+			raise ValueError('predict_parallel() needs a file-backed input, %s is held in memory' % type(filename).__name__)
+		treeNum = getattr(filename, 'treeNum', treeNum)
+		filename = filename.path
+
+	if workers is None: workers = multiprocessing.cpu_count()
+	if shards is None: shards = 4*workers
+
+	total = int(min(iterations, len(open_source(filename, treeNum, engine, chunk_size))))
+
+	t0 = time.time()
+
+	tasks = [(filename, treeNum, start, count, hadron_cut, ep_cut, iso_cutoff, engine, chunk_size, selection, max_seeds)
+	         for start, count in shard_ranges(total, shards)]
+
+	pool = multiprocessing.Pool(workers)
+	try:
+		results = pool.map(_run_shard, tasks, 1) # returned in entry order
+	finally:
+		pool.close()
+		pool.join()
+
+	multiple = isinstance(iso_cutoff, (list, tuple))
+	if not multiple: results = [[shard] for shard in results]
+
+	predictions = results[0]
+	for shard in results[1:]:
+		for p, s in zip(predictions, shard):
+			p.merge(s)
+
+	t1 = time.time()
+
+	for cutoff, p in zip(working_points(iso_cutoff), predictions):
+		if multiple: print 'Working point: ', cutoff
+		print_summary(p.accuracy, t1 - t0)
+	if (selection == 'bound'): print predictions[0].planner, '\n'
+
+	if multiple: return [(p.tau, p.other) for p in predictions]
+	return predictions[0].tau, predictions[0].other
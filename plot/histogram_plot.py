@@ -1,7 +1,7 @@
 import math
 import ROOT
 from ROOT import *
-from predict import predict
+from cache import cached_predict
 
 def parameter_stack(pred_tau, bins, low, high, parameter, xlabel, ylabel, title, filename):
 	"""
@@ -380,10 +380,12 @@ iterations = 25000
 working_points1 = [('low', 0.05), ('medium', 0.03), ('tight', 0.02)]
 working_points2 = [('low', 0.20), ('medium', 0.12), ('tight', 0.08)]
 
-# get predictions
-for name, wp in working_points2:
-	pred_tau1, pred_other1 = predict(filename1, treeNum, iterations, 0.5, 0.5, wp)
-	pred_tau3, pred_other3 = predict(filename3, treeNum, iterations, 0.5, 0.5, wp)
+# get predictions for every working point in one pass
+cutoffs = [wp for name, wp in working_points2]
+predictions1 = cached_predict(filename1, treeNum, iterations, 0.5, 0.5, cutoffs)
+predictions3 = cached_predict(filename3, treeNum, iterations, 0.5, 0.5, cutoffs)
+
+for (name, wp), (pred_tau1, pred_other1), (pred_tau3, pred_other3) in zip(working_points2, predictions1, predictions3):
 
 	# efficiency plots
 	eff_hist(pred_tau1, pred_other1, pred_tau3, pred_other3, 15, 0., 200., lambda x: x.Pt(), 
@@ -2,6 +2,9 @@ import math
 import ROOT
 from ROOT import *
 from predict import *
+from cache import cached_run_predict
+from roc import roc_curve, auc, efficiency_cutoff
+import numpy as np
 from array import array
 
 def plot_iso(isolation_list1, isolation_list2, bins, low, high, filename):
@@ -59,26 +62,28 @@ def plot_iso(isolation_list1, isolation_list2, bins, low, high, filename):
 
 	return None
 
-def plot_roc(isolation_list1, isolation_list2, bins, low, high, filename, decaymode, logy = False):
+def split_isolation(isolation_list1, isolation_list2):
 	"""
-	docstring
+	Return: (signal isolation values, background isolation values)
+	Input: isolation_list1 | List of (jetID, iso) of the signal sample
+	       isolation_list2 | List of (jetID, iso) of the background sample
 	"""
-	hNum1 = TH1F("hNum1", "hNum1", bins, low, high) # correct tau
-	hNum2 = TH1F("hNum2", "hNum2", bins, low, high) # incorrect tau
+	signal = [iso for (jetID, iso) in isolation_list1 if (abs(jetID) == 15)]
+	background = [iso for (jetID, iso) in isolation_list2 if (abs(jetID) != 15)]
+	return signal, background
+
+def plot_roc(signal_eff, background_eff, filename, decaymode, logy = False):
+	"""
+	Return: None
+	Input: signal_eff     | Signal efficiency array of roc_curve()
+	       background_eff | Background efficiency array of roc_curve()
+	       filename       | Output name (without .png)
+	       decaymode      | Sample name, selects the reference points
+	       logy           | Log-scale y-axis
+	"""
+	x = np.ascontiguousarray(signal_eff, dtype = np.float64) # ROC curve arrays
+	y = np.ascontiguousarray(background_eff, dtype = np.float64)
 
-	for (jetID, iso) in isolation_list1:
-		if (abs(jetID) == 15):
-			hNum1.Fill(iso)
-	for (jetID, iso) in isolation_list2:  
-		if (abs(jetID) != 15): 
-			hNum2.Fill(iso)
-		
-	hNum1_total = hNum1.Integral() # get totals
-	hNum2_total = hNum2.Integral(1, bins + 1)
-	
-	x = array('d'); y = array('d') # ROC curve arrays
-	x.append(0.); y.append(0.)
-	
 	lx = array('d'); ly = array('d') # Reference line arrays
 	lx.append(0.); lx.append(1.); ly.append(0.); ly.append(1.)
 
@@ -91,11 +96,7 @@ def plot_roc(isolation_list1, isolation_list2, bins, low, high, filename, decaym
 		actual_x.append(58.9/100); actual_x.append(50.8/100); actual_x.append(48.1/100)
 		actual_y.append(0.00386); actual_y.append(0.00206); actual_y.append(0.00175)
 
-	for i in range(bins):
-		x.append(hNum1.Integral(1, i + 1)/hNum1_total) # signal efficiency
-		y.append(hNum2.Integral(1, i + 1)/hNum2_total) # background rejection
-
-	t1 = TGraph(bins, x, y)
+	t1 = TGraph(len(x), x, y)
 	t2 = TGraph(2, lx, ly)
 	t3 = TGraph(3, actual_x, actual_y)	
 
@@ -138,15 +139,21 @@ filename4 = "/home/drankin/TauID/GenNtuple_QCD_HT1500to2000_TuneCP5_13TeV-madgra
 treeNum = "GenNtupler/gentree"
 iterations = 25000
 
-isolation_list1 = predict(filename1, treeNum, iterations, 0.5, 0.5)
-isolation_list2 = predict(filename2, treeNum, iterations, 0.5, 0.5)
-isolation_list3 = predict(filename3, treeNum, iterations, 0.5, 0.5)
-isolation_list4 = predict(filename4, treeNum, iterations, 0.5, 0.5)
+isolation_list1 = cached_run_predict(filename1, treeNum, iterations, 0.5, 0.5).isolation
+isolation_list2 = cached_run_predict(filename2, treeNum, iterations, 0.5, 0.5).isolation
+isolation_list3 = cached_run_predict(filename3, treeNum, iterations, 0.5, 0.5).isolation
+isolation_list4 = cached_run_predict(filename4, treeNum, iterations, 0.5, 0.5).isolation
+
+for name, (list_signal, list_background) in [("GluGluHToTauTau", (isolation_list1, isolation_list3)),
+                                             ("ZPrimeToTauTau", (isolation_list2, isolation_list4))]:
+	cutoffs, signal_eff, background_eff = roc_curve(*split_isolation(list_signal, list_background))
+
+	print name, 'AUC: ', auc(signal_eff, background_eff)
+	for target in [0.4, 0.5, 0.6]:
+		print 'Signal efficiency', target, '(cutoff, signal eff, background eff): ', efficiency_cutoff(cutoffs, signal_eff, background_eff, target)
 
-plot_roc(isolation_list1, isolation_list3, 200, 0, 2, "roc_GluGluHToTauTau", "GluGluHToTauTau")
-plot_roc(isolation_list2, isolation_list4, 200, 0, 2, "roc_ZPrimeToTauTau", "ZPrimeToTauTau")
-plot_roc(isolation_list1, isolation_list3, 200, 0, 2, "roc_GluGluHToTauTau_log", "GluGluHToTauTau", True)
-plot_roc(isolation_list2, isolation_list4, 200, 0, 2, "roc_ZPrimeToTauTau_log", "ZPrimeToTauTau", True)
+	plot_roc(signal_eff, background_eff, "roc_" + name, name)
+	plot_roc(signal_eff, background_eff, "roc_" + name + "_log", name, True)
 
 plot_iso(isolation_list1, isolation_list3, 40, 0, 2, "iso_GluGluHToTauTau")
 plot_iso(isolation_list1, isolation_list3, 40, 0, 0.5, "iso_GluGluHToTauTau_zoom")
@@ -1,39 +1,91 @@
-import math, itertools, time
-import ROOT, sys, os, re, string
-from ROOT import *
+import math, itertools, heapq, time
+import sys, os, re, string
+from grid import EtaPhiGrid
+from fourvector import FourVector
+from strips import gen_strips
+from sources import open_source
+from utilities.progress import ProgressReporter
+from utilities import profiling
+from hypotheses import CandidatePool, best_candidates, best_candidates_planned, PlannerStats, pt_bound, first_candidate, guesses
+
+class ParticleGroups(object):
+	"""
+	Per-event particles bucketed by jet (CSR layout)
+	Each bucket is (offsets, indices): the particles of jet j are
+	indices[offsets[j]:offsets[j + 1]], in tree order
+	"""
+	__slots__ = ('hadrons', 'ep', 'leptons')
 
-def update_progress(progress):
+	def __init__(self, hadrons, ep, leptons):
+		self.hadrons = hadrons # (offsets, indices) of |ID| > 40
+		self.ep = ep           # (offsets, indices) of ID in [22, 11, -11]
+		self.leptons = leptons # (offsets, indices) of 10 < |ID| < 20
+
+def _bucket(keys, indices, num_jets):
+	"""
+	Return: (offsets, indices grouped by key)
+	Input: keys     | Jet number of each particle
+	       indices  | Particle indices to bucket
+	       num_jets | Number of jets
 	"""
-	Return: Progress Bar
-	Input: progress | Fraction completed from 0->1
+	offsets = [0]*(num_jets + 1)
+	for k in indices:
+		offsets[keys[k] + 1] += 1
+	for j in range(num_jets):
+		offsets[j + 1] += offsets[j]
+
+	fill = offsets[:-1]
+	order = [0]*offsets[-1]
+	for k in indices:
+		j = keys[k]
+		order[fill[j]] = k
+		fill[j] += 1
+
+	return (offsets, order)
+
+def group_particles(event):
 	"""
-	barLength = 20
-	status = ''
+	Return: ParticleGroups
+	Input: event | ROOT event
+	"""
+	num_jets = len(event.genjetid)
+	genindex = list(event.genindex)
+	genid = list(event.genid)
+
+	hadrons = []; ep = []; leptons = []
+	for k, jet_num in enumerate(genindex):
+		if not (0 <= jet_num < num_jets): continue
 
-	if (progress >= 1):
-		progress = 1
-		status = "Done...\r\n"
+		ID = genid[k]
+		if (abs(ID) > 40): hadrons.append(k)
+		elif (ID in (22, 11, -11)): ep.append(k)
+		if (10 < abs(ID) < 20): leptons.append(k)
 
-	block = int(round(barLength*progress))
-	text = '\rPercent: [{0}] {1}% {2}'.format('#'*block + '-'*(barLength - block), progress*100, status)
-	sys.stdout.write(text)
-	sys.stdout.flush()
+	return ParticleGroups(_bucket(genindex, hadrons, num_jets),
+	                      _bucket(genindex, ep, num_jets),
+	                      _bucket(genindex, leptons, num_jets))
 
-def remove_leptons(event, jet_num):
+def _members(bucket, jet_num):
+	offsets, indices = bucket
+	return indices[offsets[jet_num]:offsets[jet_num + 1]]
+
+def remove_leptons(event, jet_num, groups = None):
 	"""
 	Return: Boolean
 	Input: event   | ROOT event
 	       jet_num | Jet number
+	       groups  | ParticleGroups of the event
 	"""
+	if groups is None: groups = group_particles(event)
+
 	ep = [] # electron/positron candidates
 	other = [] # other lepton candidates
 
-	for k, _ in enumerate(event.genindex):
-		if (event.genindex[k] == jet_num) and (10 < abs(event.genid[k]) < 20): 
-			if (abs(event.genid[k]) != 11):
-				other.append(event.genid[k])
-			else:
-				ep.append(event.genid[k])
+	for k in _members(groups.leptons, jet_num):
+		if (abs(event.genid[k]) != 11):
+			other.append(event.genid[k])
+		else:
+			ep.append(event.genid[k])
 	
 	if (len(ep) == 0):
 		if (len(other) != 0): return True
@@ -43,149 +95,113 @@ def remove_leptons(event, jet_num):
 	
 	return False
 
-def gen_strips(ep_4v):
-	"""
-	Return: List of strip four vectors
-	Input: ep_4v | List of electron/photon candidate four vectors
-	"""
-
-	total_num = len(ep_4v) # total number of candidates
-	strip_4v = []         
-	
-	for i in range(min(6, total_num)): # consider 
-		indices = [i]
-
-		# initialize parameters
-		strip_vec = ep_4v[i]
-		for j in range(i + 1, total_num):
-			eta = strip_vec.Eta()
-
-			# if particle in strip
-			if ((eta-0.025) < ep_4v[j].Eta() < (eta+0.025)) and (ep_4v[j].DeltaPhi(strip_vec) < 0.10):
-				indices.append(j)
-
-				# initialize new parameters
-				new_eta = 0; new_phi = 0; total_Pt = 0; total_E = 0
-
-				for idx in indices: # update parameters
-					new_eta += ep_4v[idx].Eta()*ep_4v[idx].Pt()
-					new_phi += ep_4v[idx].Phi()*ep_4v[idx].Pt()
-					total_Pt += ep_4v[idx].Pt()
-					total_E += ep_4v[idx].E()
-				
-				strip_vec.SetPtEtaPhiE(total_Pt, new_eta/total_Pt, new_phi/total_Pt, total_E)
-		
-		if strip_vec.Pt() > 2.5:
-			strip_4v.append(strip_vec)
-	
-	return strip_4v
-
-def gen_candidates(event, jet_num, hadron_cut, ep_cut):
+def gen_candidates(event, jet_num, hadron_cut, ep_cut, groups = None, max_seeds = 6):
 	"""
-	Return: (List of hadron candidates, List of strips)
+	Return: CandidatePool of the jet
 	Input: event      | ROOT event
 	       jet_num    | Jet number
 		   hadron_cut | Pt cutoff for hadrons
 		   ep_cut     | Pt cutoff for electrons/photons
+		   groups     | ParticleGroups of the event
+		   max_seeds  | Number of leading electron/photon candidates used as strip seeds
 	"""
-	hadron_4v = [] # hadron candidate 4vec
-	ep_4v = []     # electron/photon candidate 4vec
+	if groups is None: groups = group_particles(event)
 
-	for k, _ in enumerate(event.genindex):
-		if (event.genindex[k] == jet_num):
-			vec = TLorentzVector()
-			vec.SetPtEtaPhiE(event.genpt[k], event.geneta[k], event.genphi[k], event.genenergy[k])
+	prof = profiling.active()
+	if prof: t0 = time.time()
 
-			if ((abs(event.genid[k]) > 40) and (event.genpt[k] > hadron_cut)):
-				hadron_4v.append((k, vec))
-			if ((event.genid[k] in ([22, 11, -11])) and (event.genpt[k] > ep_cut)):
-				ep_4v.append(vec)
+	hadron_heap = [] # min-heap of the 5 highest Pt hadrons: (Pt, order, candidate)
+	ep_4v = []       # electron/photon candidates: (Pt, order, candidate)
 
-			hadron_4v = sorted(hadron_4v, key = lambda x: x[1].Pt())[-5:] # sort hadrons
-			ep_4v = sorted(ep_4v, key = lambda x: x.Pt())[::-1]           # sort strips
+	for order, k in enumerate(_members(groups.hadrons, jet_num)):
+		pt = event.genpt[k]
+		if (pt > hadron_cut):
+			if (len(hadron_heap) == 5) and ((pt, order) < hadron_heap[0][:2]): continue
 
-	return (hadron_4v, gen_strips(ep_4v))
+			ID = event.genid[k]
+			vec = FourVector(pt, event.geneta[k], event.genphi[k], event.genenergy[k])
+			entry = (pt, order, (k, vec, event.gencharge[k], (ID > 0) - (ID < 0)))
 
-def hypothesis1(event, hadron_4v):
+			if (len(hadron_heap) < 5): heapq.heappush(hadron_heap, entry)
+			else: heapq.heapreplace(hadron_heap, entry)
+
+	for order, k in enumerate(_members(groups.ep, jet_num)):
+		pt = event.genpt[k]
+		if (pt > ep_cut):
+			vec = FourVector(pt, event.geneta[k], event.genphi[k], event.genenergy[k])
+			ep_4v.append((pt, order, (k, vec)))
+
+	hadrons = [entry[2] for entry in sorted(hadron_heap)]                 # ascending Pt
+	ep = [entry[2] for entry in sorted(ep_4v, key = lambda x: x[:2])[::-1]] # descending Pt
+
+	if prof: t1 = time.time(); prof.add('gen_candidates', t1 - t0)
+
+	strips = gen_strips([vec for _, vec in ep], max_seeds)
+
+	if prof: prof.add('gen_strips', time.time() - t1)
+	return CandidatePool(jet_num, hadrons, ep, strips)
+
+def hypothesis1(pool):
 	"""
 	Return: Guesses for h+/-, h-/+, h-/+ hypothesis
-	Input: event     | ROOT event
-		   hadron_4v | List of hadron candidate (indexes, four vectors)
+	Input: pool | CandidatePool of the jet
 	"""
-	guesses = []
-
-	for triple in itertools.combinations(hadron_4v, 3):
-		if (any(event.genid[e[0]] < 0 for e in triple) and any(event.genid[e[0]] > 0 for e in triple)):
-			if (not any(event.gencharge[t[0]] == 0 for t in triple)): # charge check
-				candidates = (triple[0][1], triple[1][1], triple[2][1])
-				vec_sum = candidates[0] + candidates[1] + candidates[2]
-
-				if 0.8 < vec_sum.M() < 1.5: # mass check
-					DeltaR_cut = 3.0/vec_sum.Pt()
-					if (not any(vec_sum.DeltaR(c2) > DeltaR_cut for c2 in candidates)): # deltaR check
-						pt_sum = candidates[0].Pt() + candidates[1].Pt() + candidates[2].Pt()
-						guesses.append((pt_sum, vec_sum))
-	return guesses
+	return guesses(pool, '1')
 
-def hypothesis2(event, hadron_4v, strip_4v):
+def hypothesis2(pool):
 	"""
 	Return: Guesses for h+/-, pi0, pi0 hypothesis
-	Input: event     | ROOT event
-	       hadron_4v | List of hadron candidate (indexes, four vectors)
-		   strip_4v  | List of strip four vectors
-	"""
-	guesses = []
-
-	for h in hadron_4v:
-		if (abs(event.gencharge[h[0]]) == 1): # charge check
-			for pair in itertools.combinations(strip_4v, 2):
-				candidates = (h[1], pair[0], pair[1])
-				vec_sum = candidates[0] + candidates[1] + candidates[2]
-				cutoff = min(max(1.2*math.sqrt(vec_sum.Pt()/100), 1.2), 4.0)
-	
-				if 0.4 < vec_sum.M() < cutoff: # mass check
-					DeltaR_cut = 3.0/vec_sum.Pt()
-					if (not any(vec_sum.DeltaR(c2) > DeltaR_cut for c2 in candidates)): # deltaR check 
-						pt_sum = candidates[0].Pt() + candidates[1].Pt() + candidates[2].Pt()
-						guesses.append((pt_sum, vec_sum))
-	return guesses
+	Input: pool | CandidatePool of the jet
+	"""
+	return guesses(pool, '2')
 
-def hypothesis3(event, hadron_4v, strip_4v):
+def hypothesis3(pool):
 	"""
 	Return: Guesses for h+/-, pi0 hypothesis
-	Input: event     | ROOT event
-	       hadron_4v | List of hadron candidate (indexes, four vectors)
-		   strip_4v  | List of strip four vectors
+	Input: pool | CandidatePool of the jet
 	"""
-	guesses = []
+	return guesses(pool, '3')
 
-	for h in hadron_4v:
-		if (abs(event.gencharge[h[0]]) == 1): # charge check
-			for s in strip_4v:
-				candidates = (h[1], s)
-				vec_sum = candidates[0] + candidates[1]
-				cutoff = min(max(1.3*math.sqrt(vec_sum.Pt()/100), 1.3), 4.2)
+def hypothesis4(pool):
+	"""
+	Return: Guesses for h+/- hypothesis
+	Input: pool | CandidatePool of the jet
+	"""
+	return guesses(pool, '4')
+
+def isolation_particles(event):
+	"""
+	Return: EtaPhiGrid of isolation particles (charged hadrons and photons)
+	Input: event | ROOT event
+	"""
+	eta = []; phi = []; pt = []
 
-				if 0.3 < vec_sum.M() < cutoff: # mass check
-					DeltaR_cut = 3.0/vec_sum.Pt()
-					if (not any(vec_sum.DeltaR(c2) > DeltaR_cut for c2 in candidates)): 
-						pt_sum = candidates[0].Pt() + candidates[1].Pt()
-						guesses.append((pt_sum, vec_sum))
-	return guesses
+	for k, ID in enumerate(event.genisoid):
+		if ((ID > 40) and (abs(event.genisocharge[k]) == 1)) or (ID == 22):
+			eta.append(event.genisoeta[k])
+			phi.append(event.genisophi[k])
+			pt.append(event.genisopt[k])
 
-def hypothesis4(event, hadron_4v, strip_4v):
+	return EtaPhiGrid(eta, phi, pt, 0.4)
+
+def isolation_batch(iso_grid, pairs, cutoff):
 	"""
-	Return: Guesses for h+/-, pi0 hypothesis
-	Input: event     | ROOT event
-	       hadron_4v | List of hadron candidate (indexes, four vectors)
-		   strip_4v  | List of strip four vectors
+	Return: List of (iso, Boolean)
+	Input: iso_grid | EtaPhiGrid of isolation particles
+		   pairs    | List of tuples: (pt_sum, 4vec)
+		   cutoff   | Isolation cutoff
 	"""
-	guesses = []
-	
-	if (len(strip_4v) == 0 and len(hadron_4v) == 1):
-		if (abs(event.gencharge[hadron_4v[0][0]]) == 1): # charge check
-			guesses.append((hadron_4v[0][1].Pt(), hadron_4v[0][1]))
-	return guesses
+	ptsums = iso_grid.cone_sums([vec.Eta() for _, vec in pairs], [vec.Phi() for _, vec in pairs])
+
+	results = []
+	for (vec_ptsum, vec), ptsum in zip(pairs, ptsums):
+		if not (vec.Pt() > 0.5): ptsum = 0
+		iso = (float(ptsum) - vec_ptsum)/vec.Pt()
+
+		if (iso > cutoff): results.append((iso, False))
+		else: results.append((iso, True))
+
+	return results
 
 def isolation(event, pair, cutoff):
 	"""
@@ -194,121 +210,388 @@ def isolation(event, pair, cutoff):
 		   pair   | Tuple: (pt_sum, 4vec)
 		   cutoff | Isolation cutoff
 	"""	
-	vec_ptsum, vec = pair
-	ptsum = 0
-
-	for k, _ in enumerate(event.genisoid):
-		if ((event.genisoid[k] > 40) and (abs(event.genisocharge[k]) == 1)) or (event.genisoid[k] == 22):
-			vec_test = TLorentzVector()
-			vec_test.SetPtEtaPhiE(event.genisopt[k], event.genisoeta[k], event.genisophi[k], event.genisoenergy[k])
-			if ((vec.DeltaR(vec_test) < 0.4) and (vec.Pt() > 0.5)):
-				ptsum += vec_test.Pt()
+	return isolation_batch(isolation_particles(event), [pair], cutoff)[0]
+
+# bump when a change alters predict() results (invalidates cached results)
+ALGORITHM_VERSION = 1
+
+class Predictions(object):
+	"""
+	Accumulated output of predict()
+	"""
+	def __init__(self):
+		self.tau = []       # list of (ID, guess, 4vec)
+		self.other = []     # list of (ID, 4vec)
+		self.isolation = [] # list of (ID, iso)
+		self.accuracy = [0., 0., 0., 0., 0., 0.]
+		self.events = 0
+		self.rejected = 0 # jets decided by the pre-selection
+		self.planner = PlannerStats() # filled by selection = 'bound'
+
+	def merge(self, other):
+		"""
+		Return: self, with other (the following entries) appended
+		Input: other | Predictions
+		"""
+		self.tau.extend(other.tau)
+		self.other.extend(other.other)
+		self.isolation.extend(other.isolation)
+		self.accuracy = [a + b for a, b in zip(self.accuracy, other.accuracy)]
+		self.events += other.events
+		self.rejected += other.rejected
+		self.planner.merge(other.planner)
+		return self
+
+def record_jet(event, jet_num, max_, iso_result, predictions):
+	"""
+	Return: None
+	Input: event       | ROOT event
+	       jet_num     | Jet number
+	       max_        | Entry of hypotheses.best_candidates(): (guess ID, (pt_sum, 4vec)), or None
+	       iso_result  | (iso, Boolean) of the candidate, None if not isolated
+	       predictions | Predictions to update
+	"""
+	accuracy = predictions.accuracy
+	tau_present = False
+
+	# isolist contains (all tau reconstructions (tau + not tau) +  
+
+	if max_:
+		if (max_[1][1].Pt() > 20): # Only consider candidates with Pt > 20
+			iso, truth = iso_result
+			predictions.isolation.append((event.genjetid[jet_num], iso))
+
+			if truth:
+				tau_present = True
+				predictions.tau.append((event.genjetid[jet_num], max_[0], max_[1][1]))
+		
+			else:
+				predictions.other.append((event.genjetid[jet_num], max_[1][1]))
+	
+	elif (event.genjetpt[jet_num] > 20): # Pt > 20 (Adjust value?)
+		vec = FourVector(event.genjetpt[jet_num], event.genjeteta[jet_num], event.genjetphi[jet_num], event.genjetenergy[jet_num])
+		predictions.other.append((event.genjetid[jet_num], vec))
+		predictions.isolation.append((event.genjetid[jet_num], 1000)) # arbitrary large iso
+	
+	# accuracy
+	if (abs(event.genjetid[jet_num]) == 15) and (event.genjetpt[jet_num] > 20):
+		if tau_present:
+			accuracy[0] += 1 # total correct
+			accuracy[2] += 1 # total taus identified
+		accuracy[3] += 1 # total taus
+	elif (event.genjetpt[jet_num] > 20):
+		if (not tau_present):
+			accuracy[0] += 1 # total correct
+			accuracy[4] += 1 # total not taus identified
+		accuracy[5] += 1 # total not taus
+	accuracy[1] += 1 # total
 	
-	iso = (ptsum - vec_ptsum)/vec.Pt()
+	"""
+	# debug code here
+	"""
+
+class PreparedEvent(object):
+	"""
+	Per-jet candidates, isolation particles and jet kinematics of one event,
+	detached from the tree so events can be classified in batches
+	Exposes the genjet* branches under their ROOT names
+	"""
+	__slots__ = ('genjetid', 'genjetpt', 'genjeteta', 'genjetphi', 'genjetenergy', 'jets', 'iso_grid')
+
+def prepare_event(event, hadron_cut, ep_cut, max_seeds = 6):
+	"""
+	Return: PreparedEvent
+	Input: event      | ROOT event
+	       hadron_cut | Pt cutoff for hadrons
+	       ep_cut     | Pt cutoff for electrons/photons
+	       max_seeds  | Number of strip seeds per jet
+	"""
+	prof = profiling.active()
+	if prof: t0 = time.time()
+
+	groups = group_particles(event) # bucket particles by jet once per event
+
+	if prof: prof.add('group_particles', time.time() - t0)
 
-	if (iso > cutoff): return (iso, False)
+	prepared = PreparedEvent()
+	prepared.jets = [] # list of CandidatePools
+	for jet_num, _  in enumerate(event.genjetid):
+		if prof: t0 = time.time()
+		leptonic = remove_leptons(event, jet_num, groups)
+		if prof: prof.add('remove_leptons', time.time() - t0)
 
-	return (iso, True)
+		if leptonic: # disregard lepton decays
+			if prof: prof.count('jets skipped as leptonic')
+			continue
+		prepared.jets.append(gen_candidates(event, jet_num, hadron_cut, ep_cut, groups, max_seeds))
 
-def predict(filename, treeNum, iterations, hadron_cut = 0, ep_cut = 0, iso_cutoff = float('inf')):
+	if prof: t0 = time.time()
+	prepared.iso_grid = isolation_particles(event) if prepared.jets else None
+	if prof: prof.add('isolation_particles', time.time() - t0)
+	prepared.genjetid = list(event.genjetid)
+	prepared.genjetpt = list(event.genjetpt)
+	prepared.genjeteta = list(event.genjeteta)
+	prepared.genjetphi = list(event.genjetphi)
+	prepared.genjetenergy = list(event.genjetenergy)
+
+	return prepared
+
+def working_points(iso_cutoff):
 	"""
-	Return: List of predictions
-	Input: filename   | ROOT file
+	Return: List of isolation cutoffs
+	Input: iso_cutoff | Isolation cutoff or list of cutoffs
+	"""
+	if isinstance(iso_cutoff, (list, tuple)): return list(iso_cutoff)
+	return [iso_cutoff]
+
+def preselect(prepared_events):
+	"""
+	Return: (CandidatePools that need the hypotheses, {id(pool): best_candidates() entry} of the others)
+	Input: prepared_events | List of PreparedEvents
+
+	A jet whose candidates cannot sum above Pt 20 never yields a candidate
+	record_jet() keeps. Its outcome then only depends on whether any
+	hypothesis fires at all, which matters only for jets with genjetpt > 20
+	"""
+	selected = []; decided = {}
+	for prepared in prepared_events:
+		for pool in prepared.jets:
+			if (pt_bound(pool) > 20): selected.append(pool)
+			elif (prepared.genjetpt[pool.jet_num] > 20): decided[id(pool)] = first_candidate(pool)
+			else: decided[id(pool)] = None
+
+	return selected, decided
+
+def classify_batch(prepared_events, iso_cutoff, predictions, selection = 'batch'):
+	"""
+	Return: None
+	Input: prepared_events | List of PreparedEvents
+	       iso_cutoff      | Isolation cutoff or list of cutoffs
+	       predictions     | Predictions to update, or list of Predictions (one per cutoff)
+	       selection       | 'batch' (all combinations as arrays) or 'bound' (branch-and-bound planner)
+	"""
+	cutoffs = working_points(iso_cutoff)
+	if not isinstance(predictions, list): predictions = [predictions]
+
+	prof = profiling.active()
+	jets = [pool for prepared in prepared_events for pool in prepared.jets]
+
+	if prof: t0 = time.time()
+	selected, decided = preselect(prepared_events)
+	if prof: prof.add('preselect', time.time() - t0, len(jets)); prof.count('jets rejected by pre-selection', len(decided))
+	for p in predictions: p.rejected += len(decided)
+
+	if (selection == 'bound'):
+		if prof: t0 = time.time()
+		stats = PlannerStats() # the planner runs once for every working point
+		found = best_candidates_planned(selected, stats)
+		for p in predictions: p.planner.merge(stats)
+		if prof: prof.add('hypotheses (planner)', time.time() - t0, len(selected))
+	else: # evaluate the hypotheses of every jet in the batch at once
+		found = best_candidates(selected)
+
+	found = dict(zip([id(pool) for pool in selected], found))
+	found.update(decided)
+
+	for prepared in prepared_events:
+		candidates = [(pool.jet_num, found[id(pool)]) for pool in prepared.jets]
+
+		# isolate every candidate of the event in one call, the cutoffs only apply afterwards
+		pairs = [max_[1] for _, max_ in candidates if max_ and (max_[1][1].Pt() > 20)]
+		if prof: t0 = time.time()
+		iso_values = iter(isolation_batch(prepared.iso_grid, pairs, float('inf')) if pairs else [])
+		if prof: prof.add('isolation', time.time() - t0)
+
+		for jet_num, max_ in candidates:
+			iso = None
+			if max_ and (max_[1][1].Pt() > 20): iso = next(iso_values)[0]
+
+			for cutoff, wp_predictions in zip(cutoffs, predictions):
+				iso_result = None
+				if iso is not None: iso_result = (iso, not (iso > cutoff))
+				record_jet(prepared, jet_num, max_, iso_result, wp_predictions)
+
+def read_events(filename, treeNum, iterations, engine = 'event', chunk_size = 5000, start = 0):
+	"""
+	Return: Generator of events
+	Input: filename   | ROOT file, .npz file, event store or EventSource
 	       treeNum    | ROOT tree number
 	       iterations | Number of events to consider
-		   hadron_cut | Pt cutoff for hadrons
-		   ep_cut     | Pt cutoff for electrons/photons
+	       engine     | 'event' (PyROOT iteration) or 'columnar' (chunked bulk read)
+	       chunk_size | Number of events per bulk read
+	       start      | First entry to read
 	"""
-	rf = TFile(filename)      # open file
-	tree = rf.Get(treeNum)    # get TTree
-	
-	predictions_tau = [] # list of (ID, 4vec)
-	predictions_other = [] # list of (ID, 4vec)
-	isolation_list = [] # list of (ID, iso)
+	return open_source(filename, treeNum, engine, chunk_size).events(start, start + iterations)
 
-	accuracy = [0., 0., 0., 0., 0., 0.]
-	event_num = 0.
-	
-	t0 = time.time()
-		
-	for event in tree:
-		if (event_num >= iterations): break
-		for jet_num, _  in enumerate(event.genjetid):
-
-			if remove_leptons(event, jet_num): # disregard lepton decays
-				continue
-
-			tau_present = False; max_pt = []
-
-			hadron_4v, strip_4v = gen_candidates(event, jet_num, hadron_cut, ep_cut)
-			
-			guesses1 = hypothesis1(event, hadron_4v)
-			guesses2 = hypothesis2(event, hadron_4v, strip_4v)
-			guesses3 = hypothesis3(event, hadron_4v, strip_4v)
-			guesses4 = hypothesis4(event, hadron_4v, strip_4v)
-
-			if guesses1: max_pt.append(('1', max(guesses1, key = lambda x: x[1].Pt())))
-			if guesses2: max_pt.append(('2', max(guesses2, key = lambda x: x[1].Pt())))
-			if guesses3: max_pt.append(('3', max(guesses3, key = lambda x: x[1].Pt())))	
-			if guesses4: max_pt.append(('4', max(guesses4, key = lambda x: x[1].Pt())))
-		
-			# isolist contains (all tau reconstructions (tau + not tau) +  
-
-			if max_pt:
-				max_ = max(max_pt, key = lambda x: x[1][1].Pt())
-				if (max_[1][1].Pt() > 20): # Only consider candidates with Pt > 20
-					iso, truth = isolation(event, max_[1], iso_cutoff)
-					isolation_list.append((event.genjetid[jet_num], iso))
-
-					if truth:
-						tau_present = True
-						predictions_tau.append((event.genjetid[jet_num], max_[0], max_[1][1]))
-				
-					else:
-						predictions_other.append((event.genjetid[jet_num], max_[1][1]))
-			
-			elif (event.genjetpt[jet_num] > 20): # Pt > 20 (Adjust value?)
-				vec = TLorentzVector()
-				vec.SetPtEtaPhiE(event.genjetpt[jet_num], event.genjeteta[jet_num], event.genjetphi[jet_num], event.genjetenergy[jet_num])
-				predictions_other.append((event.genjetid[jet_num], vec))
-				isolation_list.append((event.genjetid[jet_num], 1000)) # arbitrary large iso
-			
-			# accuracy
-			if (abs(event.genjetid[jet_num]) == 15) and (event.genjetpt[jet_num] > 20):
-				if tau_present:
-					accuracy[0] += 1 # total correct
-					accuracy[2] += 1 # total taus identified
-				accuracy[3] += 1 # total taus
-			elif (event.genjetpt[jet_num] > 20):
-				if (not tau_present):
-					accuracy[0] += 1 # total correct
-					accuracy[4] += 1 # total not taus identified
-				accuracy[5] += 1 # total not taus
-			accuracy[1] += 1 # total
-			
-			"""
-			# debug code here
-			"""
-
-		event_num += 1
-		update_progress(event_num/iterations)
+def stream_events(events, iterations, hadron_cut, ep_cut, iso_cutoff, chunk_size = 5000, selection = 'batch', progress = True,
+                  max_seeds = 6):
+	"""
+	Return: Generator of (Predictions of one chunk, running accuracy counters)
+	        With a list of cutoffs: (list of Predictions, list of counters), one per cutoff
+	Input: events     | Iterable of events
+	       iterations | Number of events expected (for the progress bar)
+	       hadron_cut | Pt cutoff for hadrons
+	       ep_cut     | Pt cutoff for electrons/photons
+	       iso_cutoff | Isolation cutoff or list of cutoffs
+	       chunk_size | Number of events per chunk
+	       selection  | 'batch' (vectorized hypotheses) or 'bound' (branch-and-bound planner)
+	       progress   | Show progress bar (True/False), or ProgressReporter
+	       max_seeds  | Number of strip seeds per jet
+	"""
+	if progress is True: progress = ProgressReporter(iterations)
 
-	t1 = time.time()
+	cutoffs = working_points(iso_cutoff)
+	accuracy = [[0., 0., 0., 0., 0., 0.] for _ in cutoffs]
+	batch = []
+
+	def classify(batch):
+		predictions = [Predictions() for _ in cutoffs]
+		for p in predictions: p.events = len(batch)
+		classify_batch(batch, cutoffs, predictions, selection)
 
+		for i, p in enumerate(predictions):
+			accuracy[i] = [a + b for a, b in zip(accuracy[i], p.accuracy)]
+		if progress: progress.count(taus = len(predictions[0].tau), other = len(predictions[0].other))
+
+		if isinstance(iso_cutoff, (list, tuple)): return (predictions, [list(a) for a in accuracy])
+		return (predictions[0], list(accuracy[0]))
+
+	for event in events:
+		prepared = prepare_event(event, hadron_cut, ep_cut, max_seeds)
+		batch.append(prepared)
+		if progress: progress.update(1, len(prepared.jets))
+
+		if (len(batch) >= chunk_size):
+			yield classify(batch)
+			batch = []
+
+	if batch:
+		yield classify(batch)
+	if progress: progress.close()
+
+def run_events(events, iterations, hadron_cut, ep_cut, iso_cutoff, chunk_size = 5000, selection = 'batch', progress = True,
+               max_seeds = 6):
+	"""
+	Return: Predictions, or list of Predictions for a list of cutoffs
+	Input: events     | Iterable of events
+	       iterations | Number of events expected (for the progress bar)
+	       hadron_cut | Pt cutoff for hadrons
+	       ep_cut     | Pt cutoff for electrons/photons
+	       iso_cutoff | Isolation cutoff or list of cutoffs
+	       chunk_size | Number of events per hypothesis batch
+	       selection  | 'batch' (vectorized hypotheses) or 'bound' (branch-and-bound planner)
+	       progress   | Show progress bar (True/False), or ProgressReporter
+	       max_seeds  | Number of strip seeds per jet
+	"""
+	predictions = [Predictions() for _ in working_points(iso_cutoff)]
+
+	for chunk, _ in stream_events(events, iterations, hadron_cut, ep_cut, working_points(iso_cutoff), chunk_size, selection, progress,
+	                              max_seeds):
+		for p, c in zip(predictions, chunk):
+			p.merge(c)
+
+	if isinstance(iso_cutoff, (list, tuple)): return predictions
+	return predictions[0]
+
+def print_summary(accuracy, runtime):
+	"""
+	Return: None
+	Input: accuracy | Accuracy counters
+	       runtime  | Runtime in seconds
+	"""
 	total_accuracy = accuracy[0]/accuracy[1]*100
 	if accuracy[3]:
 		efficiency = accuracy[2]/accuracy[3]*100
 		false_positive_rate = (1 - accuracy[4]/accuracy[5])*100
 
-	print 'Runtime: ', (t1 - t0), 'seconds\n'
+	print 'Runtime: ', runtime, 'seconds\n'
 	print 'Total Accuracy: ', total_accuracy, '%'
 
 	if accuracy[3]:
 		print 'Efficency: ', efficiency, '%'
 		print 'False Positive Rate: ', false_positive_rate, '%\n'
+
+def run_predict(filename, treeNum, iterations, hadron_cut = 0, ep_cut = 0, iso_cutoff = float('inf'), engine = 'event', chunk_size = 5000, selection = 'batch',
+                metrics = None, max_seeds = 6):
+	"""
+	Return: Predictions, or list of Predictions for a list of cutoffs
+	Input: same as predict()
+	"""
+	t0 = time.time()
+
+	source = open_source(filename, treeNum, engine, chunk_size)
+	events = source.events(0, iterations)
+	progress = ProgressReporter(iterations, metrics = metrics, sample = source.name)
+	predictions = run_events(events, iterations, hadron_cut, ep_cut, iso_cutoff, chunk_size, selection, progress, max_seeds)
+
+	t1 = time.time()
+
+	if source.report(): print source.report(), '\n'
+	first = predictions[0] if isinstance(iso_cutoff, (list, tuple)) else predictions
+	print 'Jets rejected by pre-selection: ', first.rejected, '\n'
+	if isinstance(iso_cutoff, (list, tuple)):
+		for cutoff, p in zip(iso_cutoff, predictions):
+			print 'Working point: ', cutoff
+			print_summary(p.accuracy, t1 - t0)
+		if (selection == 'bound'): print predictions[0].planner, '\n'
+	else:
+		print_summary(predictions.accuracy, t1 - t0)
+		if (selection == 'bound'): print predictions.planner, '\n'
+
+	if profiling.active(): print profiling.active(), '\n'
+
+	return predictions
+
+def predict(filename, treeNum, iterations, hadron_cut = 0, ep_cut = 0, iso_cutoff = float('inf'), engine = 'event', chunk_size = 5000, selection = 'batch',
+            metrics = None, max_seeds = 6):
+	"""
+	Return: List of predictions
+	        With a list of cutoffs: list of (predictions_tau, predictions_other), one per cutoff
+	Input: filename   | ROOT file, .npz file, event store or EventSource
+	       treeNum    | ROOT tree number
+	       iterations | Number of events to consider
+		   hadron_cut | Pt cutoff for hadrons
+		   ep_cut     | Pt cutoff for electrons/photons
+		   iso_cutoff | Isolation cutoff, or list of cutoffs evaluated in the same pass
+		   engine     | 'event' (PyROOT iteration) or 'columnar' (chunked bulk read)
+		   chunk_size | Number of events per bulk read and hypothesis batch
+		   selection  | 'batch' (vectorized hypotheses) or 'bound' (branch-and-bound planner)
+		   metrics    | Metrics file updated during the run (Prometheus text for *.prom, JSON lines otherwise)
+		   max_seeds  | Number of leading electron/photon candidates used as strip seeds per jet
+	"""
+	predictions = run_predict(filename, treeNum, iterations, hadron_cut, ep_cut, iso_cutoff, engine, chunk_size, selection, metrics,
+	                          max_seeds)
+
+	if isinstance(iso_cutoff, (list, tuple)):
+		return [(p.tau, p.other) for p in predictions]
 	
-	#return isolation_list
-	return predictions_tau, predictions_other
+	#return predictions.isolation
+	return predictions.tau, predictions.other
 
+def predict_stream(filename, treeNum, iterations, hadron_cut = 0, ep_cut = 0, iso_cutoff = float('inf'), engine = 'event', chunk_size = 5000, selection = 'batch',
+                   metrics = None, max_seeds = 6):
+	"""
+	Return: Generator of (Predictions of one chunk, running accuracy counters)
+	Input: filename   | ROOT file, .npz file, event store or EventSource
+	       treeNum    | ROOT tree number
+	       iterations | Number of events to consider
+		   hadron_cut | Pt cutoff for hadrons
+		   ep_cut     | Pt cutoff for electrons/photons
+		   iso_cutoff | Isolation cutoff or list of cutoffs
+		   engine     | 'event' (PyROOT iteration) or 'columnar' (chunked bulk read)
+		   chunk_size | Number of events per chunk
+		   selection  | 'batch' (vectorized hypotheses) or 'bound' (branch-and-bound planner)
+		   metrics    | Metrics file updated during the run (Prometheus text for *.prom, JSON lines otherwise)
+		   max_seeds  | Number of leading electron/photon candidates used as strip seeds per jet
 
+	Only one chunk of predictions is held at a time, e.g.
 
+		for chunk, accuracy in predict_stream(filename, treeNum, iterations, 0.5, 0.5):
+			for (jetID, guessID, vec) in chunk.tau: hNum1.Fill(vec.Pt())
+	"""
+	source = open_source(filename, treeNum, engine, chunk_size)
+	events = source.events(0, iterations)
+	progress = ProgressReporter(iterations, metrics = metrics, sample = source.name)
+	for chunk, accuracy in stream_events(events, iterations, hadron_cut, ep_cut, iso_cutoff, chunk_size, selection, progress,
+	                                     max_seeds):
+		yield (chunk, accuracy)
@@ -0,0 +1,50 @@
+import numpy as np
+
+def roc_curve(signal, background):
+	"""
+	Return: (cutoffs, signal efficiency, background efficiency) arrays
+	        Point i counts the jets with iso <= cutoffs[i], point 0 is (-inf, 0, 0)
+	Input: signal     | Isolation values of signal jets
+	       background | Isolation values of background jets
+	"""
+	signal = np.asarray(signal, dtype = np.float64)
+	background = np.asarray(background, dtype = np.float64)
+
+	values = np.concatenate((signal, background))
+	is_signal = np.concatenate((np.ones(len(signal)), np.zeros(len(background))))
+
+	order = np.argsort(values, kind = 'mergesort')
+	values = values[order]
+	signal_count = np.cumsum(is_signal[order])
+	background_count = np.arange(1, len(values) + 1) - signal_count
+
+	# one point per distinct value, after all jets with that value
+	last = np.append(values[1:] != values[:-1], True) if len(values) else np.zeros(0, dtype = bool)
+
+	cutoffs = np.append(-np.inf, values[last])
+	signal_eff = np.append(0., signal_count[last]/max(len(signal), 1))
+	background_eff = np.append(0., background_count[last]/max(len(background), 1))
+
+	return cutoffs, signal_eff, background_eff
+
+def auc(signal_eff, background_eff):
+	"""
+	Return: Area under the signal efficiency vs background efficiency curve
+	Input: signal_eff     | Signal efficiency array of roc_curve()
+	       background_eff | Background efficiency array of roc_curve()
+	"""
+	return float(np.trapz(signal_eff, background_eff))
+
+def efficiency_cutoff(cutoffs, signal_eff, background_eff, target):
+	"""
+	Return: (cutoff, signal efficiency, background efficiency) of the smallest
+	        cutoff reaching the target signal efficiency, None if unreachable
+	Input: cutoffs        | Cutoff array of roc_curve()
+	       signal_eff     | Signal efficiency array of roc_curve()
+	       background_eff | Background efficiency array of roc_curve()
+	       target         | Signal efficiency from 0->1
+	"""
+	i = int(np.searchsorted(signal_eff, target, 'left')) # signal_eff is non-decreasing
+	if (i == len(cutoffs)): return None
+
+	return float(cutoffs[i]), float(signal_eff[i]), float(background_eff[i])
@@ -0,0 +1,201 @@
+import bisect, time
+from fourvector import FourVector
+from strips import gen_strips
+from utilities.progress import ProgressReporter
+from hypotheses import CandidatePool, best_candidates, best_candidates_planned, PlannerStats
+from predict import (group_particles, remove_leptons, isolation_particles, isolation_batch, record_jet,
+                     read_events, PreparedEvent, Predictions, _members)
+
+class ScanJet(object):
+	"""
+	Cut-independent candidates of one jet
+	Hadrons are kept in ascending and electrons/photons in descending Pt
+	(the order gen_candidates() produces), so any Pt cut selects a
+	contiguous slice of either list
+	"""
+	__slots__ = ('jet_num', 'hadrons', 'hadron_pts', 'ep', 'ep_pts', 'strips')
+
+	def __init__(self, jet_num, hadrons, ep):
+		"""
+		Input: jet_num | Jet number
+		       hadrons | List of (Pt, (index, 4vec, charge, sign)), ascending Pt
+		       ep      | List of (Pt, (index, 4vec)), descending Pt
+		"""
+		self.jet_num = jet_num
+		self.hadrons = [h for _, h in hadrons]
+		self.hadron_pts = [pt for pt, _ in hadrons]
+		self.ep = [e for _, e in ep]
+		self.ep_pts = [-pt for pt, _ in ep] # negated so it is ascending
+		self.strips = {} # number of electron/photon candidates -> strips
+
+	def key(self, hadron_cut, ep_cut):
+		"""
+		Return: (first hadron, number of electrons/photons) selected by the cuts
+		Input: hadron_cut | Pt cutoff for hadrons
+		       ep_cut     | Pt cutoff for electrons/photons
+		"""
+		first = bisect.bisect_right(self.hadron_pts, hadron_cut) # first hadron with Pt > hadron_cut
+		first = max(first, len(self.hadrons) - 5)                 # 5 highest Pt hadrons
+		return (first, bisect.bisect_left(self.ep_pts, -ep_cut))
+
+	def pool(self, key):
+		"""
+		Return: CandidatePool, as gen_candidates() builds it for any cuts with this key
+		Input: key | Output of key()
+		"""
+		first, num_ep = key
+		ep = self.ep[:num_ep]
+
+		if num_ep not in self.strips: # strips only depend on ep_cut
+			self.strips[num_ep] = gen_strips([vec for _, vec in ep])
+
+		return CandidatePool(self.jet_num, self.hadrons[first:], ep, self.strips[num_ep])
+
+def prepare_scan_event(event):
+	"""
+	Return: PreparedEvent with ScanJets in place of CandidatePools
+	Input: event | ROOT event
+	"""
+	groups = group_particles(event)
+
+	prepared = PreparedEvent()
+	prepared.jets = []
+	for jet_num, _ in enumerate(event.genjetid):
+		if remove_leptons(event, jet_num, groups): # disregard lepton decays
+			continue
+
+		hadrons = []; ep = []
+		for order, k in enumerate(_members(groups.hadrons, jet_num)):
+			pt = event.genpt[k]
+			ID = event.genid[k]
+			vec = FourVector(pt, event.geneta[k], event.genphi[k], event.genenergy[k])
+			hadrons.append((pt, order, (k, vec, event.gencharge[k], (ID > 0) - (ID < 0))))
+
+		for order, k in enumerate(_members(groups.ep, jet_num)):
+			pt = event.genpt[k]
+			vec = FourVector(pt, event.geneta[k], event.genphi[k], event.genenergy[k])
+			ep.append((pt, order, (k, vec)))
+
+		hadrons.sort(key = lambda x: x[:2])
+		ep.sort(key = lambda x: x[:2], reverse = True)
+		prepared.jets.append(ScanJet(jet_num, [(h[0], h[2]) for h in hadrons], [(e[0], e[2]) for e in ep]))
+
+	prepared.iso_grid = isolation_particles(event) if prepared.jets else None
+	prepared.genjetid = list(event.genjetid)
+	prepared.genjetpt = list(event.genjetpt)
+	prepared.genjeteta = list(event.genjeteta)
+	prepared.genjetphi = list(event.genjetphi)
+	prepared.genjetenergy = list(event.genjetenergy)
+
+	return prepared
+
+def scan_batch(prepared_events, grid, iso_cutoff, accuracy, selection = 'batch', stats = None):
+	"""
+	Return: None
+	Input: prepared_events | List of PreparedEvents from prepare_scan_event()
+	       grid            | List of (hadron_cut, ep_cut)
+	       iso_cutoff      | Isolation cutoff
+	       accuracy        | List of accuracy counters to update, one per grid point
+	       selection       | 'batch' (vectorized hypotheses) or 'bound' (branch-and-bound planner)
+	       stats           | PlannerStats for selection = 'bound'
+	"""
+	# grid points that select the same candidates of a jet share one evaluation
+	index = [] # per event and jet, pool index of every grid point
+	pools = []
+	for prepared in prepared_events:
+		event_index = []
+		for jet in prepared.jets:
+			unique = {}
+			for hadron_cut, ep_cut in grid:
+				key = jet.key(hadron_cut, ep_cut)
+				if key not in unique:
+					unique[key] = len(pools)
+					pools.append(jet.pool(key))
+			event_index.append([unique[jet.key(hadron_cut, ep_cut)] for hadron_cut, ep_cut in grid])
+		index.append((len(pools), event_index))
+
+	if (selection == 'bound'): best = best_candidates_planned(pools, stats)
+	else: best = best_candidates(pools)
+
+	# isolation of every distinct candidate, the cutoff only applies afterwards
+	iso = [None]*len(pools)
+	first = 0
+	for prepared, (last, _) in zip(prepared_events, index):
+		indices = [i for i in range(first, last) if best[i] and (best[i][1][1].Pt() > 20)]
+		first = last
+		if indices:
+			values = isolation_batch(prepared.iso_grid, [best[i][1] for i in indices], float('inf'))
+			for i, (value, _) in zip(indices, values): iso[i] = value
+
+	for g in range(len(grid)):
+		predictions = Predictions()
+		for prepared, (_, event_index) in zip(prepared_events, index):
+			for jet, jet_index in zip(prepared.jets, event_index):
+				i = jet_index[g]
+				iso_result = None
+				if iso[i] is not None: iso_result = (iso[i], not (iso[i] > iso_cutoff))
+				record_jet(prepared, jet.jet_num, best[i], iso_result, predictions)
+
+		accuracy[g] = [a + b for a, b in zip(accuracy[g], predictions.accuracy)]
+
+def print_table(rows):
+	"""
+	Return: None
+	Input: rows | Output of scan()
+	"""
+	print '%10s %10s %12s %12s %12s' % ('hadron_cut', 'ep_cut', 'accuracy %', 'efficiency %', 'fpr %')
+	for hadron_cut, ep_cut, total_accuracy, efficiency, false_positive_rate in rows:
+		print '%10g %10g %12.4f %12.4f %12.4f' % (hadron_cut, ep_cut, total_accuracy, efficiency, false_positive_rate)
+
+def scan(filename, treeNum, iterations, hadron_cuts, ep_cuts, iso_cutoff = float('inf'), engine = 'event', chunk_size = 5000, selection = 'batch'):
+	"""
+	Return: List of (hadron_cut, ep_cut, accuracy %, efficiency %, false positive rate %), one per grid point
+	Input: filename    | ROOT file
+	       treeNum     | ROOT tree number
+	       iterations  | Number of events to consider
+	       hadron_cuts | List of Pt cutoffs for hadrons
+	       ep_cuts     | List of Pt cutoffs for electrons/photons
+	       iso_cutoff  | Isolation cutoff
+	       engine      | 'event' (PyROOT iteration) or 'columnar' (chunked bulk read)
+	       chunk_size  | Number of events per bulk read and hypothesis batch
+	       selection   | 'batch' (vectorized hypotheses) or 'bound' (branch-and-bound planner)
+
+	Every grid point gives the same counters as predict() with those cuts.
+	Events are read and grouped once; jets whose selected candidates do
+	not change between grid points are evaluated once.
+	"""
+	t0 = time.time()
+
+	grid = [(hadron_cut, ep_cut) for hadron_cut in hadron_cuts for ep_cut in ep_cuts]
+	accuracy = [[0., 0., 0., 0., 0., 0.] for _ in grid]
+	stats = PlannerStats()
+
+	progress = ProgressReporter(iterations)
+	batch = []
+	for event in read_events(filename, treeNum, iterations, engine, chunk_size):
+		prepared = prepare_scan_event(event)
+		batch.append(prepared)
+		progress.update(1, len(prepared.jets))
+
+		if (len(batch) >= chunk_size):
+			scan_batch(batch, grid, iso_cutoff, accuracy, selection, stats)
+			batch = []
+
+	if batch:
+		scan_batch(batch, grid, iso_cutoff, accuracy, selection, stats)
+	progress.close()
+
+	rows = []
+	for (hadron_cut, ep_cut), counters in zip(grid, accuracy):
+		total_accuracy = counters[0]/counters[1]*100 if counters[1] else 0.
+		efficiency = counters[2]/counters[3]*100 if counters[3] else 0.
+		false_positive_rate = (1 - counters[4]/counters[5])*100 if counters[5] else 0.
+		rows.append((hadron_cut, ep_cut, total_accuracy, efficiency, false_positive_rate))
+
+	t1 = time.time()
+
+	print 'Runtime: ', t1 - t0, 'seconds\n'
+	print_table(rows)
+	if (selection == 'bound'): print '\n', stats
+
+	return rows
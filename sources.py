@@ -0,0 +1,235 @@
+import os
+import numpy as np
+from jagged import JaggedArray, Chunk
+
+# branches read by each HPS stage of predict()
+STAGE_BRANCHES = [
+	('group_particles', ['genindex', 'genid']),
+	('remove_leptons', ['genid']),
+	('gen_candidates', ['genid', 'genpt', 'geneta', 'genphi', 'genenergy', 'gencharge']),
+	('isolation_particles', ['genisoid', 'genisocharge', 'genisopt', 'genisoeta', 'genisophi']),
+	('record_jet', ['genjetid', 'genjetpt', 'genjeteta', 'genjetphi', 'genjetenergy']),
+]
+
+def plan_branches(stages = None):
+	"""
+	Return: List of branches read by the stages, in declaration order
+	Input: stages | List of stage names (default: all stages)
+	"""
+	branches = []
+	for stage, stage_branches in STAGE_BRANCHES:
+		if (stages is None) or (stage in stages):
+			branches.extend(b for b in stage_branches if b not in branches)
+	return branches
+
+BRANCHES = plan_branches()
+
+# integer branches, the rest are stored as floats
+INT_BRANCHES = ['genindex', 'genid', 'gencharge', 'genisoid', 'genisocharge', 'genjetid']
+
+class EventSource(object):
+	"""
+	Input of predict(): a sequence of events exposing the GenNtupler branches
+	Subclasses implement __len__ and events()
+	"""
+	name = ''
+	path = None # file or directory read by the source, None for in-memory sources
+
+	def __len__(self):
+		raise NotImplementedError
+
+	def events(self, start = 0, stop = None):
+		"""
+		Return: Generator of events
+		Input: start | First entry
+		       stop  | Entry to stop before (default: all entries)
+		"""
+		raise NotImplementedError
+
+	def report(self):
+		"""
+		Return: Summary of the input read so far, or None
+		"""
+		return None
+
+class RootSource(EventSource):
+	"""
+	TTree of a ROOT file
+	Only the planned branches are enabled and a TTreeCache prefetches
+	their baskets, so unused branches (e.g. parentage) are never read
+	"""
+	def __init__(self, filename, treeNum, engine = 'event', chunk_size = 5000, branches = None):
+		"""
+		Input: filename   | ROOT file
+		       treeNum    | ROOT tree number
+		       engine     | 'event' (PyROOT iteration) or 'columnar' (chunked bulk read)
+		       chunk_size | Number of events per bulk read
+		       branches   | Branches to read (default: BRANCHES)
+		"""
+		self.filename = filename
+		self.path = filename
+		self.treeNum = treeNum
+		self.engine = engine
+		self.chunk_size = chunk_size
+		self.branches = BRANCHES if branches is None else branches
+		self.name = os.path.basename(filename)
+
+		self.bytes_read = 0   # bytes read from the file by events()
+		self.entries_read = 0 # entries read by events()
+		self.branches_total = None
+
+	def _tree(self):
+		from ROOT import TFile
+
+		rf = TFile(self.filename) # open file
+		return rf, rf.Get(self.treeNum)
+
+	def _plan(self, tree):
+		"""
+		Return: None
+		Input: tree | TTree to configure
+		"""
+		self.branches_total = tree.GetListOfBranches().GetEntries()
+
+		tree.SetBranchStatus('*', 0)
+		for b in self.branches: tree.SetBranchStatus(b, 1)
+
+		# the cache holds one cluster of the active branches
+		entries = max(int(tree.GetEntries()), 1)
+		per_entry = sum(tree.GetBranch(b).GetZipBytes() for b in self.branches)/float(entries)
+		cluster = tree.GetAutoFlush() if (tree.GetAutoFlush() > 0) else self.chunk_size
+		tree.SetCacheSize(int(min(max(1.2*per_entry*cluster, 1 << 20), 256 << 20)))
+
+		for b in self.branches: tree.AddBranchToCache(b, True)
+		tree.StopCacheLearningPhase()
+
+	def __len__(self):
+		rf, tree = self._tree()
+		entries = int(tree.GetEntries())
+		rf.Close()
+		return entries
+
+	def events(self, start = 0, stop = None):
+		rf, tree = self._tree() # rf stays open while the generator runs
+		entries = int(tree.GetEntries())
+		stop = entries if stop is None else int(min(stop, entries))
+		self._plan(tree)
+
+		bytes_before = rf.GetBytesRead()
+		if (self.engine == 'columnar'):
+			from jagged import read_chunks
+
+			for chunk in read_chunks(tree, self.branches, stop, self.chunk_size, start):
+				for event in chunk:
+					yield event
+		else:
+			for entry in range(start, stop):
+				tree.GetEntry(entry)
+				yield tree
+
+		self.bytes_read += rf.GetBytesRead() - bytes_before
+		self.entries_read += max(stop - start, 0)
+
+	def report(self):
+		if not self.entries_read: return None
+		return 'Branches read: %d of %s, bytes read: %d (%.1f bytes/event)' % (
+			len(self.branches), self.branches_total, self.bytes_read, float(self.bytes_read)/self.entries_read)
+
+class NpzSource(EventSource):
+	"""
+	Jagged arrays saved by save_npz(), read without ROOT
+	"""
+	def __init__(self, filename, chunk_size = 5000):
+		"""
+		Input: filename   | .npz file
+		       chunk_size | Number of events converted to lists at a time
+		"""
+		self.filename = filename
+		self.path = filename
+		self.chunk_size = chunk_size
+		self.name = os.path.basename(filename)
+
+		data = np.load(filename)
+		self.arrays = dict((b, JaggedArray(data[b + '_content'], data[b + '_offsets'])) for b in BRANCHES)
+		data.close()
+
+	def __len__(self):
+		return len(self.arrays['genjetid'])
+
+	def events(self, start = 0, stop = None):
+		stop = len(self) if stop is None else int(min(stop, len(self)))
+
+		for first in range(start, stop, self.chunk_size):
+			last = min(first + self.chunk_size, stop)
+
+			arrays = {}
+			for branch, jagged in self.arrays.items():
+				offsets = jagged.offsets[first:last + 1]
+				arrays[branch] = JaggedArray(jagged.content[offsets[0]:offsets[-1]], offsets - offsets[0])
+
+			for event in Chunk(arrays):
+				yield event
+
+class GeneratorSource(EventSource):
+	"""
+	Events held in memory or produced on the fly
+	"""
+	def __init__(self, events, entries = None, name = 'generator'):
+		"""
+		Input: events  | List of events, or function returning a new iterable of events
+		       entries | Number of events (default: len(events))
+		       name    | Sample name
+		"""
+		self.factory = events if callable(events) else None
+		self.items = None if callable(events) else events
+		self.entries = len(events) if entries is None else entries
+		self.name = name
+
+	def __len__(self):
+		return self.entries
+
+	def events(self, start = 0, stop = None):
+		stop = self.entries if stop is None else min(stop, self.entries)
+
+		for entry, event in enumerate(self.factory() if self.factory else self.items):
+			if (entry >= stop): break
+			if (entry >= start): yield event
+
+def open_source(filename, treeNum = None, engine = 'event', chunk_size = 5000, branches = None):
+	"""
+	Return: EventSource
+	Input: filename   | EventSource, .npz file, store directory or ROOT file
+	       treeNum    | ROOT tree number
+	       engine     | 'event' (PyROOT iteration) or 'columnar' (chunked bulk read)
+	       chunk_size | Number of events per bulk read
+	       branches   | Branches to read from a ROOT file (default: BRANCHES)
+	"""
+	if isinstance(filename, EventSource): return filename
+	if filename.endswith('.npz'): return NpzSource(filename, chunk_size)
+	if os.path.isdir(filename):
+		from store import StoreSource
+		return StoreSource(filename, chunk_size)
+	return RootSource(filename, treeNum, engine, chunk_size, branches)
+
+def save_npz(filename, events):
+	"""
+	Return: Number of events written
+	Input: filename | Output .npz file
+	       events   | Iterable of events, e.g. RootSource(...).events()
+	"""
+	columns = dict((b, []) for b in BRANCHES)
+	for event in events:
+		for branch in BRANCHES:
+			columns[branch].append(np.array(list(getattr(event, branch)),
+			                                dtype = np.int32 if branch in INT_BRANCHES else np.float64))
+
+	arrays = {}
+	for branch, column in columns.items():
+		jagged = JaggedArray.from_objects(column)
+		content = jagged.content
+		if not len(content): content = content.astype(np.int32 if branch in INT_BRANCHES else np.float64)
+		arrays[branch + '_content'] = content
+		arrays[branch + '_offsets'] = jagged.offsets
+
+	np.savez(filename, **arrays)
+	return len(columns['genjetid'])
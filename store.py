@@ -0,0 +1,131 @@
+import os, json, shutil, argparse
+import numpy as np
+from jagged import JaggedArray, Chunk
+from sources import EventSource, RootSource, open_source, BRANCHES, INT_BRANCHES
+
+STORE_VERSION = 2
+
+# GenNtupler branches kept in a store, independent of the branches predict() reads
+STORE_BRANCHES = ['genpt', 'geneta', 'genphi', 'genenergy', 'genid', 'gencharge', 'genindex',
+                  'genisoid', 'genisocharge', 'genisopt', 'genisoeta', 'genisophi', 'genisoenergy',
+                  'genjetid', 'genjetpt', 'genjeteta', 'genjetphi', 'genjetenergy']
+
+# content dtypes; floats are kept at double precision so a store reproduces its input exactly
+DTYPES = dict((b, 'int32' if b in INT_BRANCHES else 'float64') for b in STORE_BRANCHES)
+
+def is_store(path):
+	"""
+	Return: Boolean
+	Input: path | File or directory
+	"""
+	return os.path.isfile(os.path.join(path, 'meta.json'))
+
+def write_store(directory, events, chunk_size = 5000, branches = STORE_BRANCHES):
+	"""
+	Return: Number of events written
+	Input: directory  | Output directory (replaced if it is a store)
+	       events     | Iterable of events, e.g. RootSource(..., branches = STORE_BRANCHES).events()
+	       chunk_size | Number of events buffered between writes
+	       branches   | Branches to write, recorded in meta.json
+
+	Each branch is written as <branch>.content (flat values) and
+	<branch>.offsets (int64, entries + 1 boundaries) raw arrays.
+	meta.json is written last, so an interrupted conversion is not
+	mistaken for a store.
+	"""
+	if is_store(directory): shutil.rmtree(directory)
+	if not os.path.isdir(directory): os.makedirs(directory)
+
+	contents = dict((b, open(os.path.join(directory, b + '.content'), 'wb')) for b in branches)
+	offsets = dict((b, open(os.path.join(directory, b + '.offsets'), 'wb')) for b in branches)
+	totals = dict((b, 0) for b in branches)
+	for b in branches: np.zeros(1, dtype = np.int64).tofile(offsets[b])
+
+	def flush(buffers, counts):
+		for b in branches:
+			np.asarray(buffers[b], dtype = DTYPES[b]).tofile(contents[b])
+			np.asarray(counts[b], dtype = np.int64).tofile(offsets[b])
+
+	entries = 0
+	buffers = dict((b, []) for b in branches); counts = dict((b, []) for b in branches)
+	try:
+		for event in events:
+			for b in branches:
+				values = list(getattr(event, b))
+				buffers[b].extend(values)
+				totals[b] += len(values)
+				counts[b].append(totals[b])
+			entries += 1
+
+			if (entries % chunk_size == 0):
+				flush(buffers, counts)
+				buffers = dict((b, []) for b in branches); counts = dict((b, []) for b in branches)
+		flush(buffers, counts)
+	finally:
+		for f in list(contents.values()) + list(offsets.values()): f.close()
+
+	with open(os.path.join(directory, 'meta.json'), 'w') as f:
+		json.dump({'version': STORE_VERSION, 'entries': entries, 'branches': list(branches),
+		           'dtypes': dict((b, DTYPES[b]) for b in branches)}, f, indent = 1, sort_keys = True)
+
+	return entries
+
+class StoreSource(EventSource):
+	"""
+	Store written by write_store(), memory-mapped read-only
+	Workers opening the same store share its pages through the OS page cache
+	"""
+	def __init__(self, directory, chunk_size = 5000):
+		"""
+		Input: directory  | Store directory
+		       chunk_size | Number of events converted to lists at a time
+		"""
+		self.directory = directory
+		self.path = directory
+		self.chunk_size = chunk_size
+		self.name = os.path.basename(os.path.normpath(directory))
+
+		with open(os.path.join(directory, 'meta.json')) as f:
+			meta = json.load(f)
+		if (meta['version'] != STORE_VERSION):
+			raise ValueError('%s: store version %s, expected %s' % (directory, meta['version'], STORE_VERSION))
+		self.entries = meta['entries']
+		missing = [b for b in BRANCHES if b not in meta['branches']]
+		if missing: raise ValueError('%s: store lacks branches %s' % (directory, ', '.join(missing)))
+
+		self.arrays = {}
+		for b in BRANCHES:
+			offsets = np.memmap(os.path.join(directory, b + '.offsets'), dtype = np.int64, mode = 'r')
+			if offsets[-1]: content = np.memmap(os.path.join(directory, b + '.content'), dtype = meta['dtypes'][b], mode = 'r')
+			else: content = np.zeros(0, dtype = meta['dtypes'][b]) # empty files cannot be mapped
+			self.arrays[b] = JaggedArray(content, offsets)
+
+	def __len__(self):
+		return self.entries
+
+	def events(self, start = 0, stop = None):
+		stop = self.entries if stop is None else int(min(stop, self.entries))
+
+		for first in range(start, stop, self.chunk_size):
+			last = min(first + self.chunk_size, stop)
+
+			arrays = {}
+			for branch, jagged in self.arrays.items():
+				offsets = np.asarray(jagged.offsets[first:last + 1])
+				arrays[branch] = JaggedArray(jagged.content[offsets[0]:offsets[-1]], offsets - offsets[0])
+
+			for event in Chunk(arrays):
+				yield event
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument('filename', help='ROOT or .npz filename')
+	parser.add_argument('output', help='store directory')
+	parser.add_argument('-n', '--number', dest='number', type=int, default=0, help='number of events (default: all)')
+	parser.add_argument('-t', '--tree', dest='tree', default='GenNtupler/gentree', help='tree name')
+	parser.add_argument('-e', '--engine', dest='engine', default='columnar', help="'event' or 'columnar' ROOT reading")
+	options = parser.parse_args()
+
+	source = open_source(options.filename, options.tree, options.engine, branches = STORE_BRANCHES)
+	branches = STORE_BRANCHES if isinstance(source, RootSource) else BRANCHES # an .npz only holds the branches predict() reads
+	print 'Wrote', write_store(options.output, source.events(0, options.number or None), branches = branches), 'events to', options.output
@@ -0,0 +1,63 @@
+import bisect
+from fourvector import FourVector, delta_phi
+import kernels
+
+def gen_strips(ep_4v, max_seeds = 6):
+	"""
+	Return: List of strip four vectors
+	Input: ep_4v     | List of electron/photon candidate four vectors (descending Pt)
+	       max_seeds | Number of leading candidates used as strip seeds
+
+	Each seed collects the later candidates within 0.025 in eta and
+	DeltaPhi < 0.10 of the current strip centre. The centre is the Pt
+	weighted eta/phi of the strip so far plus all of its members, kept
+	as running sums so adding a member is O(1). Neighbours are found
+	with a sweep over the candidates sorted by eta; ep_4v is not modified.
+	"""
+	if kernels.active():
+		rows = kernels.strips([vec.pt for vec in ep_4v], [vec.eta for vec in ep_4v],
+		                      [vec.phi for vec in ep_4v], [vec.e for vec in ep_4v], max_seeds)
+		return [FourVector(*[float(x) for x in row]) for row in rows]
+
+	total_num = len(ep_4v) # total number of candidates
+	strip_4v = []
+
+	by_eta = sorted((vec.eta, j) for j, vec in enumerate(ep_4v))
+	etas = [eta for eta, _ in by_eta]
+
+	for i in range(min(max_seeds, total_num)):
+		seed = ep_4v[i]
+
+		# strip parameters
+		pt = seed.pt; eta = seed.eta; phi = seed.phi; E = seed.e
+
+		# running sums over the members added so far
+		sum_pt = 0.; sum_eta = 0.; sum_phi = 0.; sum_E = 0.
+
+		last = i # candidates up to last have been considered
+		while True:
+			lo = bisect.bisect_right(etas, eta - 0.025)
+			hi = bisect.bisect_left(etas, eta + 0.025)
+
+			# first later candidate inside the current eta window and phi road
+			j = None
+			for _, k in by_eta[lo:hi]:
+				if (k > last) and ((j is None) or (k < j)) and (delta_phi(ep_4v[k].phi, phi) < 0.10):
+					j = k
+			if j is None: break
+			last = j
+
+			vec = ep_4v[j]
+			sum_pt += vec.pt; sum_eta += vec.eta*vec.pt; sum_phi += vec.phi*vec.pt; sum_E += vec.e
+
+			# update parameters
+			total_pt = pt + sum_pt
+			eta = (eta*pt + sum_eta)/total_pt
+			phi = (phi*pt + sum_phi)/total_pt
+			E = E + sum_E
+			pt = total_pt
+
+		if pt > 2.5:
+			strip_4v.append(FourVector(pt, eta, phi, E))
+
+	return strip_4v
@@ -0,0 +1,130 @@
+import json
+
+class Profiler(object):
+	"""
+	Stage timers and counters aggregated over a run
+	"""
+	def __init__(self, label = ''):
+		"""
+		Input: label | Name of the run (e.g. code version), kept in exports
+		"""
+		self.label = label
+		self.times = {}    # stage -> seconds
+		self.calls = {}    # stage -> number of timed calls
+		self.counters = {} # name -> count
+		self.order = []    # stages and counters in first-seen order
+
+	def add(self, stage, seconds, calls = 1):
+		"""
+		Return: None
+		Input: stage   | Stage name
+		       seconds | Time spent
+		       calls   | Number of calls covered
+		"""
+		if stage not in self.times:
+			self.times[stage] = 0.; self.calls[stage] = 0
+			self.order.append(stage)
+		self.times[stage] += seconds
+		self.calls[stage] += calls
+
+	def count(self, name, amount = 1):
+		"""
+		Return: None
+		Input: name   | Counter name
+		       amount | Amount to add
+		"""
+		if name not in self.counters:
+			self.counters[name] = 0
+			self.order.append(name)
+		self.counters[name] += amount
+
+	def to_dict(self):
+		"""
+		Return: Dictionary of label, stages {name: (seconds, calls)} and counters
+		"""
+		return {'label': self.label,
+		        'stages': dict((stage, (self.times[stage], self.calls[stage])) for stage in self.times),
+		        'counters': dict(self.counters)}
+
+	def save(self, path):
+		"""
+		Return: None
+		Input: path | Output JSON file
+		"""
+		with open(path, 'w') as f:
+			json.dump(self.to_dict(), f, indent = 1, sort_keys = True)
+
+	def __str__(self):
+		total = sum(self.times.values())
+		lines = ['%-36s %12s %8s %10s' % ('Stage', 'seconds', '%', 'calls')]
+		for stage in self.order:
+			if stage in self.times:
+				share = self.times[stage]/total*100 if total else 0.
+				lines.append('%-36s %12.4f %8.2f %10d' % (stage, self.times[stage], share, self.calls[stage]))
+		lines.append('')
+		lines.append('%-36s %12s' % ('Counter', 'count'))
+		for name in self.order:
+			if name in self.counters:
+				lines.append('%-36s %12d' % (name, self.counters[name]))
+		return '\n'.join(lines)
+
+def load(path):
+	"""
+	Return: Profiler
+	Input: path | JSON file written by Profiler.save()
+	"""
+	with open(path) as f:
+		data = json.load(f)
+
+	profiler = Profiler(data['label'])
+	for stage, (seconds, calls) in sorted(data['stages'].items()):
+		profiler.add(stage, seconds, calls)
+	for name, amount in sorted(data['counters'].items()):
+		profiler.count(name, amount)
+	return profiler
+
+def compare(before, after):
+	"""
+	Return: Table of stage times and counters of two runs, with after/before ratios
+	Input: before | Profiler (e.g. loaded from an older code version)
+	       after  | Profiler
+	"""
+	ratio = lambda a, b: '%10.3f' % (float(b)/a) if a else '%10s' % '-'
+
+	lines = ['%-36s %12s %12s %10s' % ('Stage', before.label or 'before', after.label or 'after', 'ratio')]
+	for stage in sorted(set(before.times) | set(after.times)):
+		a = before.times.get(stage, 0.); b = after.times.get(stage, 0.)
+		lines.append('%-36s %12.4f %12.4f %s' % (stage, a, b, ratio(a, b)))
+	lines.append('')
+	for name in sorted(set(before.counters) | set(after.counters)):
+		a = before.counters.get(name, 0); b = after.counters.get(name, 0)
+		lines.append('%-36s %12d %12d %s' % (name, a, b, ratio(a, b)))
+	return '\n'.join(lines)
+
+_active = None # Profiler collecting the current run, None when profiling is off
+
+def enable(label = ''):
+	"""
+	Return: New active Profiler
+	Input: label | Name of the run
+
+	Instrumented code checks active() once per call, so a disabled
+	profiler costs one global lookup per stage
+	"""
+	global _active
+	_active = Profiler(label)
+	return _active
+
+def disable():
+	"""
+	Return: Profiler that was active, or None
+	"""
+	global _active
+	profiler, _active = _active, None
+	return profiler
+
+def active():
+	"""
+	Return: Active Profiler, or None
+	"""
+	return _active
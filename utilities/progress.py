@@ -0,0 +1,122 @@
+import sys, os, time, json, tempfile
+
+def _format_time(seconds):
+	if seconds is None: return '--:--:--'
+	minutes, seconds = divmod(int(seconds), 60)
+	hours, minutes = divmod(minutes, 60)
+	return '%02d:%02d:%02d' % (hours, minutes, seconds)
+
+class ProgressReporter(object):
+	"""
+	Progress bar and throughput metrics, refreshed at most once per interval
+	update() only adds to counters, so it is cheap enough to call per event
+	"""
+	def __init__(self, total, interval = 1.0, metrics = None, sample = '', stream = sys.stdout):
+		"""
+		Input: total    | Number of events expected
+		       interval | Seconds between reports
+		       metrics  | Metrics file: Prometheus text format for *.prom, JSON lines otherwise
+		       sample   | Sample name attached to the metrics
+		       stream   | Stream for the progress bar, None to disable it
+		"""
+		self.total = total
+		self.interval = interval
+		self.metrics = metrics
+		self.sample = sample
+		self.stream = stream
+
+		self.events = 0
+		self.jets = 0
+		self.counters = {} # per-sample counters, e.g. taus identified
+
+		self.start = time.time()
+		self.next_report = self.start + interval
+
+	def update(self, events = 1, jets = 0):
+		"""
+		Return: None
+		Input: events | Events processed since the last call
+		       jets   | Jets processed since the last call
+		"""
+		self.events += events
+		self.jets += jets
+
+		now = time.time()
+		if (now >= self.next_report):
+			self.report(now)
+			self.next_report = now + self.interval
+
+	def count(self, **counters):
+		"""
+		Return: None
+		Input: counters | Counter name -> amount to add
+		"""
+		for name, amount in counters.items():
+			self.counters[name] = self.counters.get(name, 0) + amount
+
+	def snapshot(self, now = None):
+		"""
+		Return: Dictionary of the current metrics
+		Input: now | Current time
+		"""
+		if now is None: now = time.time()
+		elapsed = max(now - self.start, 1e-9)
+		rate = self.events/elapsed
+
+		eta = None
+		if rate > 0: eta = max(self.total - self.events, 0)/rate
+
+		metrics = {'sample': self.sample, 'time': now, 'elapsed': elapsed,
+		           'events': self.events, 'total': self.total, 'jets': self.jets,
+		           'events_per_second': rate, 'jets_per_second': self.jets/elapsed, 'eta': eta}
+		metrics.update(self.counters)
+		return metrics
+
+	def report(self, now = None):
+		"""
+		Return: None
+		Input: now | Current time
+		"""
+		metrics = self.snapshot(now)
+
+		if self.stream is not None:
+			progress = min(float(self.events)/self.total, 1.) if self.total else 1.
+			block = int(round(20*progress))
+			text = '\rPercent: [{0}] {1:.1f}% | {2:.0f} events/s | {3:.0f} jets/s | ETA {4}'.format(
+				'#'*block + '-'*(20 - block), progress*100, metrics['events_per_second'],
+				metrics['jets_per_second'], _format_time(metrics['eta']))
+			self.stream.write(text)
+			self.stream.flush()
+
+		if self.metrics:
+			if self.metrics.endswith('.prom'): self._write_prometheus(metrics)
+			else: self._write_json(metrics)
+
+	def close(self):
+		"""
+		Return: None
+		"""
+		self.report()
+		if self.stream is not None:
+			self.stream.write(' Done...\r\n')
+			self.stream.flush()
+
+	def _write_json(self, metrics):
+		with open(self.metrics, 'a') as f:
+			f.write(json.dumps(metrics, sort_keys = True) + '\n')
+
+	def _write_prometheus(self, metrics):
+		label = '{sample="%s"}' % self.sample.replace('\\', '\\\\').replace('"', '\\"')
+
+		lines = []
+		for name in sorted(metrics):
+			if name in ('sample', 'time') or metrics[name] is None: continue
+			lines.append('# TYPE hps_%s gauge' % name)
+			lines.append('hps_%s%s %r' % (name, label, float(metrics[name])))
+
+		# replace the file in one step so a scrape never reads a partial file
+		directory = os.path.dirname(os.path.abspath(self.metrics))
+		fd, tmp = tempfile.mkstemp(suffix = '.prom', dir = directory)
+		with os.fdopen(fd, 'w') as f:
+			f.write('\n'.join(lines) + '\n')
+		os.rename(tmp, self.metrics)
@@ -0,0 +1,213 @@
+import math, random
+
+# branches of GenNtupler/gentree read by predict()
+GEN_BRANCHES = ['genindex', 'genid', 'genpt', 'geneta', 'genphi', 'genenergy', 'gencharge']
+ISO_BRANCHES = ['genisoid', 'genisocharge', 'genisopt', 'genisoeta', 'genisophi', 'genisoenergy']
+JET_BRANCHES = ['genjetid', 'genjetpt', 'genjeteta', 'genjetphi', 'genjetenergy']
+
+# integer branches, the rest are floats
+INT_BRANCHES = ['genindex', 'genid', 'gencharge', 'genisoid', 'genisocharge', 'genjetid']
+
+# visible hadronic tau decays: (weight, charged hadrons, pi0s)
+TAU_DECAYS = [(0.11, 1, 0), (0.26, 1, 1), (0.10, 1, 2), (0.09, 3, 0), (0.05, 3, 1)]
+
+MASSES = {211: 0.1396, 321: 0.4937, 2212: 0.9383, 130: 0.4976, 2112: 0.9396,
+          22: 0., 11: 0.000511, 13: 0.1057, 12: 0., 14: 0., 16: 0.}
+CHARGES = {211: 1, 321: 1, 2212: 1, 130: 0, 2112: 0, 22: 0, 11: -1, 13: -1, 12: 0, 14: 0, 16: 0}
+
+class SyntheticEvent(object):
+	"""
+	In-memory event with the GenNtupler branches as lists,
+	usable wherever predict() reads a ROOT event
+	"""
+	def __init__(self):
+		for branch in GEN_BRANCHES + ISO_BRANCHES + JET_BRANCHES:
+			setattr(self, branch, [])
+
+	def add_particle(self, jet_num, ID, pt, eta, phi, iso = True):
+		"""
+		Return: None
+		Input: jet_num | Jet number, -1 for particles outside jets
+		       ID      | PDG ID
+		       pt      | Transverse momentum
+		       eta     | Pseudorapidity
+		       phi     | Azimuth
+		       iso     | Also store the particle as an isolation particle
+		"""
+		phi = (phi + math.pi) % (2*math.pi) - math.pi
+		mass = MASSES[abs(ID)]
+		energy = math.sqrt((pt*math.cosh(eta))**2 + mass*mass)
+		charge = CHARGES[abs(ID)]*(1 if ID > 0 else -1)
+
+		self.genindex.append(jet_num)
+		for prefix in (['gen', 'geniso'] if iso else ['gen']):
+			getattr(self, prefix + 'id').append(ID)
+			getattr(self, prefix + 'charge').append(charge)
+			getattr(self, prefix + 'pt').append(pt)
+			getattr(self, prefix + 'eta').append(eta)
+			getattr(self, prefix + 'phi').append(phi)
+			getattr(self, prefix + 'energy').append(energy)
+
+	def add_jet(self, ID, particles):
+		"""
+		Return: None
+		Input: ID        | Jet ID (+/-15 for taus)
+		       particles | List of (pt, eta, phi, energy) of the jet constituents
+		"""
+		px = sum(pt*math.cos(phi) for pt, _, phi, _ in particles)
+		py = sum(pt*math.sin(phi) for pt, _, phi, _ in particles)
+		pz = sum(pt*math.sinh(eta) for pt, eta, _, _ in particles)
+		pt = math.hypot(px, py)
+
+		self.genjetid.append(ID)
+		self.genjetpt.append(pt)
+		self.genjeteta.append(math.asinh(pz/pt) if pt else 0.)
+		self.genjetphi.append(math.atan2(py, px))
+		self.genjetenergy.append(sum(e for _, _, _, e in particles))
+
+def _split(rnd, total, parts):
+	"""
+	Return: List of parts random fractions of total
+	"""
+	weights = [rnd.expovariate(1.) for _ in range(parts)]
+	return [total*w/sum(weights) for w in weights]
+
+def _tau_products(rnd, pt):
+	"""
+	Return: List of (ID, pt, deta, dphi) of a tau decay with visible Pt pt
+	"""
+	decay = TAU_DECAYS[-1]
+	r = rnd.random()*sum(w for w, _, _ in TAU_DECAYS)
+	for entry in TAU_DECAYS:
+		r -= entry[0]
+		if (r <= 0):
+			decay = entry
+			break
+	_, prongs, pi0s = decay
+
+	sign = rnd.choice([1, -1])
+	charges = [sign] if (prongs == 1) else [sign, sign, -sign]
+
+	cone = min(3.0/pt, 0.15) # decay products get more collimated with Pt
+	fractions = _split(rnd, pt, prongs + pi0s)
+
+	products = []
+	for charge, hadron_pt in zip(charges, fractions):
+		products.append((211*charge, hadron_pt, rnd.gauss(0, cone/2), rnd.gauss(0, cone/2)))
+
+	for pi0_pt in fractions[prongs:]:
+		deta = rnd.gauss(0, cone/2); dphi = rnd.gauss(0, cone/2)
+		share = rnd.uniform(0.2, 0.8)
+		for photon_pt in (pi0_pt*share, pi0_pt*(1 - share)): # photons spread in phi (magnetic field)
+			products.append((22, photon_pt, deta + rnd.gauss(0, 0.005), dphi + rnd.gauss(0, 0.03)))
+
+	return products
+
+def _leptonic_tau_products(rnd, pt):
+	"""
+	Return: List of (ID, pt, deta, dphi) of a leptonic tau decay
+	"""
+	lepton = rnd.choice([11, 13])
+	sign = rnd.choice([1, -1])
+	lepton_pt, nu_pt = _split(rnd, pt, 2)
+	return [(lepton*sign, lepton_pt, rnd.gauss(0, 0.02), rnd.gauss(0, 0.02)),
+	        ((lepton + 1)*(-sign), nu_pt, rnd.gauss(0, 0.05), rnd.gauss(0, 0.05))]
+
+def _qcd_products(rnd, pt, multiplicity):
+	"""
+	Return: List of (ID, pt, deta, dphi) of a QCD jet with about multiplicity constituents
+	"""
+	count = max(1, int(round(rnd.gauss(multiplicity, math.sqrt(multiplicity)))))
+
+	products = []
+	for part_pt in _split(rnd, pt, count):
+		r = rnd.random()
+		if r < 0.60: ID = rnd.choice([211, 211, 211, 321, 2212])*rnd.choice([1, -1])
+		elif r < 0.70: ID = rnd.choice([130, 2112])
+		elif r < 0.98: ID = 22
+		else: ID = rnd.choice([11, 13])*rnd.choice([1, -1])
+		width = 0.05 + 0.15*rnd.random()
+		products.append((ID, part_pt, rnd.gauss(0, width), rnd.gauss(0, width)))
+
+	return products
+
+def generate_event(rnd, jets = (1, 4), tau_fraction = 0.5, leptonic_fraction = 0.35,
+                   multiplicity = 20, underlying = 30, pt_range = (20., 150.)):
+	"""
+	Return: SyntheticEvent
+	Input: rnd               | random.Random
+	       jets              | (min, max) number of jets
+	       tau_fraction      | Fraction of jets from taus
+	       leptonic_fraction | Fraction of tau jets from leptonic decays
+	       multiplicity      | Mean number of QCD jet constituents
+	       underlying        | Number of soft particles outside jets
+	       pt_range          | (min, max) visible jet Pt
+	"""
+	event = SyntheticEvent()
+	particles = [] # (jet_num, ID, pt, eta, phi)
+
+	for jet_num in range(rnd.randint(*jets)):
+		eta = rnd.uniform(-2.5, 2.5); phi = rnd.uniform(-math.pi, math.pi)
+		pt = rnd.uniform(*pt_range)
+
+		if rnd.random() < tau_fraction:
+			ID = rnd.choice([15, -15])
+			if rnd.random() < leptonic_fraction: products = _leptonic_tau_products(rnd, pt)
+			else: products = _tau_products(rnd, pt)
+		else:
+			ID = rnd.choice([1, 2, 3, 4, 5, 21])*rnd.choice([1, -1])
+			products = _qcd_products(rnd, pt, multiplicity)
+
+		constituents = []
+		for part_ID, part_pt, deta, dphi in products:
+			particles.append((jet_num, part_ID, part_pt, eta + deta, phi + dphi))
+			constituents.append((part_pt, eta + deta, phi + dphi, part_pt*math.cosh(eta + deta)))
+		event.add_jet(ID, constituents)
+
+	for _ in range(underlying):
+		ID = rnd.choice([211, -211, 22, 22, 130])
+		particles.append((-1, ID, rnd.expovariate(1.), rnd.uniform(-3., 3.), rnd.uniform(-math.pi, math.pi)))
+
+	rnd.shuffle(particles) # the tree does not store particles grouped by jet
+	for jet_num, ID, pt, eta, phi in particles:
+		event.add_particle(jet_num, ID, pt, eta, phi, iso = (abs(ID) not in (12, 14, 16)))
+
+	return event
+
+def generate_events(number, seed = 0, **kwargs):
+	"""
+	Return: List of SyntheticEvents
+	Input: number | Number of events
+	       seed   | Random seed
+	       kwargs | Options of generate_event()
+	"""
+	rnd = random.Random(seed)
+	return [generate_event(rnd, **kwargs) for _ in range(number)]
+
+def write_tree(filename, events, treeNum = 'GenNtupler/gentree'):
+	"""
+	Return: None
+	Input: filename | Output ROOT file
+	       events   | List of SyntheticEvents
+	       treeNum  | Tree path, as passed to predict()
+	"""
+	import ROOT
+
+	rf = ROOT.TFile(filename, 'RECREATE')
+	directory, name = treeNum.rsplit('/', 1) if '/' in treeNum else ('', treeNum)
+	if directory: rf.mkdir(directory).cd()
+
+	tree = ROOT.TTree(name, name)
+	vectors = {}
+	for branch in GEN_BRANCHES + ISO_BRANCHES + JET_BRANCHES:
+		vectors[branch] = ROOT.std.vector('int' if branch in INT_BRANCHES else 'float')()
+		tree.Branch(branch, vectors[branch])
+
+	for event in events:
+		for branch, vector in vectors.items():
+			vector.clear()
+			for value in getattr(event, branch): vector.push_back(value)
+		tree.Fill()
+
+	tree.Write()
+	rf.Close()